@@ -1,13 +1,31 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Path, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 import sqlite3
+import json
+import math
+import numpy as np
 import pandas as pd
 import os
-from typing import List, Optional
+import pathlib
+import threading
+import time
+import functools
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Annotated, List, Literal, Optional
 from pydantic import BaseModel
 
+try:
+    # Arrow snapshots written by import_data.py (project root); optional, the
+    # endpoints query SQLite when the module or pyarrow is not available
+    import pyarrow.compute as pc
+
+    import snapshots
+except ImportError:
+    snapshots = None
+
 app = FastAPI(title="Swarm Data Dashboard API")
 
 # Allow CORS for development
@@ -17,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Path to the database (in the parent directory)
@@ -24,12 +43,134 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, 'foursquare_data.db')
 FRONTEND_PATH = os.path.join(BASE_DIR, 'frontend', 'dist')
 
+# --- Connection pool ---
+# Endpoints borrow read-only connections from a per-process pool instead of
+# opening the database on every request, so its schema is parsed once and its
+# page cache and memory map stay warm. The pool is dropped when DB_PATH is
+# replaced (import_data.py --staged renames a new file over it), which is
+# checked with a stat at most every DB_CHECK_INTERVAL seconds.
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_CACHE_KIB = 16384 # Page cache per connection
+DB_POOL_SIZE = 8 # Idle connections kept; busier moments open extra ones
+DB_CHECK_INTERVAL = 1.0
+
+class ConnectionPool:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = []
+        # (path, device, inode) of the file the pooled connections have open
+        self.identity = None
+        self.checked_at = 0.0
+
+    def current_identity(self):
+        now = time.monotonic()
+        with self.lock:
+            if (now - self.checked_at < DB_CHECK_INTERVAL and self.identity is not None
+                    and self.identity[0] == DB_PATH):
+                return self.identity
+        try:
+            stat = os.stat(DB_PATH)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=404,
+                detail="Database not found. Please run import_data.py first.")
+        identity = (DB_PATH, stat.st_dev, stat.st_ino)
+        with self.lock:
+            self.checked_at = now
+            if identity != self.identity:
+                stale, self.idle = self.idle, []
+                self.identity = identity
+            else:
+                stale = []
+        for conn, _ in stale:
+            conn.close()
+        return identity
+
+    def open(self):
+        # mode=ro makes SQLite refuse writes; the connection is shared between
+        # the server's worker threads, one request at a time
+        uri = pathlib.Path(DB_PATH).resolve().as_uri() + "?mode=ro"
+        try:
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        except sqlite3.OperationalError:
+            raise HTTPException(
+                status_code=404,
+                detail="Database not found. Please run import_data.py first.")
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = -{DB_CACHE_KIB}")
+        return conn
+
+    def acquire(self):
+        identity = self.current_identity()
+        with self.lock:
+            while self.idle:
+                conn, conn_identity = self.idle.pop()
+                if conn_identity == identity:
+                    return conn, identity
+                conn.close()
+        return self.open(), identity
+
+    def release(self, conn, identity):
+        if conn.in_transaction:
+            conn.rollback()
+        with self.lock:
+            if identity == self.identity and len(self.idle) < DB_POOL_SIZE:
+                self.idle.append((conn, identity))
+                return
+        conn.close()
+
+_pool = ConnectionPool()
+
+@contextmanager
 def get_db_connection():
-    if not os.path.exists(DB_PATH):
-        raise HTTPException(status_code=404, detail="Database not found. Please run import_data.py first.")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrows a pooled read-only connection for the duration of a with block."""
+    conn, identity = _pool.acquire()
+    try:
+        yield conn
+    finally:
+        _pool.release(conn, identity)
+
+# --- Aggregate cache ---
+# Results of the aggregate endpoints are kept until the database changes: the
+# key includes the database file's and its WAL's identity on disk, and
+# everything is dropped at once when import_data.py --watch posts to
+# /api/cache/invalidate. Any ?user_id= makes a new key, so only the
+# AGGREGATE_CACHE_SIZE most recently used results are kept.
+AGGREGATE_CACHE_SIZE = 256
+_aggregate_cache = OrderedDict()
+_aggregate_cache_lock = threading.Lock()
+
+def database_signature():
+    signature = []
+    for path in (DB_PATH, DB_PATH + "-wal"):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+def cached_aggregate(func):
+    """
+    Caches an endpoint's result per arguments for as long as
+    database_signature() stays the same.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())), database_signature())
+        with _aggregate_cache_lock:
+            if key in _aggregate_cache:
+                _aggregate_cache.move_to_end(key)
+                return _aggregate_cache[key]
+        result = func(*args, **kwargs)
+        with _aggregate_cache_lock:
+            _aggregate_cache[key] = result
+            while len(_aggregate_cache) > AGGREGATE_CACHE_SIZE:
+                _aggregate_cache.popitem(last=False)
+        return result
+    return wrapper
 
 # --- Models ---
 class StatSummary(BaseModel):
@@ -50,55 +191,381 @@ class WeeklyCount(BaseModel):
     week: str
     count: int
 
+class UserSummary(BaseModel):
+    id: str
+    display_name: Optional[str]
+    total_checkins: int
+
+# Largest page /api/checkins/geo hands out at once
+GEO_PAGE_MAX = 50000
+# Rows read from SQLite per chunk of a streamed response
+STREAM_BATCH_ROWS = 2000
+
+def user_filter(user_id, column="userId"):
+    """
+    SQL condition and parameters limiting a query to one account, or to all
+    when user_id is None.
+    """
+    if user_id is None:
+        return "1", []
+    return f"{column} = ?", [user_id]
+
 # --- Endpoints ---
 
+@app.post("/api/cache/invalidate")
+def invalidate_cache():
+    with _aggregate_cache_lock:
+        invalidated = len(_aggregate_cache)
+        _aggregate_cache.clear()
+    return {"invalidated": invalidated}
+
+@app.get("/api/users", response_model=List[UserSummary])
+@cached_aggregate
+def get_users():
+    query = """
+    SELECT u.id,
+           coalesce(u.displayName,
+                    trim(coalesce(u.firstName, '') || ' ' || coalesce(u.lastName, '')))
+               as display_name,
+           (SELECT count(*) FROM checkins c WHERE c.userId = u.id) as total_checkins
+    FROM users u
+    ORDER BY u.id
+    """
+    with get_db_connection() as conn:
+        rows = conn.execute(query).fetchall()
+    return [UserSummary(id=row['id'], display_name=row['display_name'],
+                        total_checkins=row['total_checkins']) for row in rows]
+
 @app.get("/api/stats", response_model=StatSummary)
-def get_stats():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT count(*) FROM checkins")
-    total_checkins = cursor.fetchone()[0]
-    cursor.execute("SELECT count(DISTINCT venueId) FROM checkins")
-    unique_venues = cursor.fetchone()[0]
-    cursor.execute("SELECT city, count(*) as cnt FROM visits WHERE city IS NOT NULL GROUP BY city ORDER BY cnt DESC LIMIT 1")
-    top_city_row = cursor.fetchone()
+@cached_aggregate
+def get_stats(user_id: Optional[str] = None):
+    where, params = user_filter(user_id)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT count(*) FROM checkins WHERE {where}", params)
+        total_checkins = cursor.fetchone()[0]
+        cursor.execute(f"SELECT count(DISTINCT venueId) FROM checkins WHERE {where}",
+                       params)
+        unique_venues = cursor.fetchone()[0]
+        cursor.execute(f"""
+            SELECT city, count(*) as cnt FROM visits
+            WHERE {where} AND city IS NOT NULL
+            GROUP BY city ORDER BY cnt DESC LIMIT 1
+        """, params)
+        top_city_row = cursor.fetchone()
     top_city = top_city_row[0] if top_city_row else "Unknown"
-    conn.close()
-    return StatSummary(total_checkins=total_checkins, unique_venues=unique_venues, top_city=top_city, total_distance_km=0.0)
+    return StatSummary(total_checkins=total_checkins, unique_venues=unique_venues,
+                       top_city=top_city, total_distance_km=0.0)
 
-@app.get("/api/checkins/geo", response_model=List[CheckinGeo])
-def get_checkins_geo():
-    conn = get_db_connection()
-    query = """
-    SELECT c.id, c.createdAt, c.shout, v.name as venue_name, v.lat, v.lng
+def parse_cursor(cursor):
+    """
+    (createdAt, id) from a cursor of the form "<createdAt>:<id>", as sent in
+    X-Next-Cursor.
+    """
+    created_at, separator, checkin_id = cursor.partition(":")
+    try:
+        if separator and checkin_id:
+            return int(created_at), checkin_id
+    except ValueError:
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+def stream_query(query, params, item, format):
+    """
+    Runs query on a pooled connection and returns a StreamingResponse that
+    writes item(row) for every row as it is read, fetchmany batch by batch:
+    one JSON object per line for format "ndjson", or one JSON array sent in
+    chunks for "json". The connection goes back to the pool once the last
+    row is sent or the client disconnects.
+    """
+    stack = ExitStack()
+    # A missing database is still a 404
+    conn = stack.enter_context(get_db_connection())
+    cursor = conn.execute(query, params)
+
+    def generate():
+        with stack:
+            separator = "\n" if format == "ndjson" else ","
+            if format == "json":
+                yield "["
+            first = True
+            while True:
+                rows = cursor.fetchmany(STREAM_BATCH_ROWS)
+                if not rows:
+                    break
+                chunk = separator.join(
+                    json.dumps(item(row), ensure_ascii=False, separators=(",", ":"))
+                    for row in rows)
+                if format == "ndjson":
+                    yield chunk + "\n"
+                else:
+                    yield chunk if first else "," + chunk
+                first = False
+            if format == "json":
+                yield "]"
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    return StreamingResponse(generate(), media_type=media_type)
+
+def checkin_geo_item(row):
+    return {
+        "id": row["id"],
+        "venue_name": row["venue_name"],
+        "lat": row["lat"],
+        "lng": row["lng"],
+        "timestamp": row["createdAt"],
+        "shout": row["shout"],
+    }
+
+def geo_query(columns, user_id=None, since=None, until=None, cursor=None):
+    """
+    SELECT of `columns` over the geolocated check-ins in (createdAt, id) order,
+    filtered as for /api/checkins/geo.
+    """
+    where, params = user_filter(user_id, "c.userId")
+    conditions = [where]
+    if since is not None:
+        conditions.append("c.createdAt >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("c.createdAt < ?")
+        params.append(until)
+    if cursor is not None:
+        conditions.append("(c.createdAt, c.id) > (?, ?)")
+        params.extend(parse_cursor(cursor))
+    query = f"""
+    SELECT {columns}
     FROM checkins c
     LEFT JOIN venues v ON c.venueId = v.id
-    WHERE v.lat IS NOT NULL AND v.lng IS NOT NULL
-    ORDER BY c.createdAt ASC
-    """
-    cursor = conn.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
-    results = []
-    for row in rows:
-        try:
-            ts = int(row['createdAt'])
-            results.append(CheckinGeo(id=row['id'], venue_name=row['venue_name'], lat=row['lat'], lng=row['lng'], timestamp=ts, shout=row['shout']))
-        except: continue
-    return results
+    WHERE v.lat IS NOT NULL AND v.lng IS NOT NULL AND typeof(c.createdAt) = 'integer'
+      AND {' AND '.join(conditions)}
+    ORDER BY c.createdAt ASC, c.id ASC
+    """
+    return query, params
+
+def fetch_page(query, params, limit, response):
+    """
+    Rows of query, at most `limit` of them, setting X-Next-Cursor on `response`
+    when there are more.
+    """
+    if limit is not None:
+        query += "LIMIT ?"
+        params = params + [limit + 1] # One more tells whether there is a next page
+    with get_db_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = f"{last['createdAt']}:{last['id']}"
+    return rows
+
+@app.get("/api/checkins/geo", response_model=List[CheckinGeo])
+def get_checkins_geo(response: Response,
+                     user_id: Optional[str] = None,
+                     since: Optional[int] = None,
+                     until: Optional[int] = None,
+                     limit: Annotated[Optional[int],
+                                      Query(ge=1, le=GEO_PAGE_MAX)] = None,
+                     cursor: Optional[str] = None,
+                     stream: Optional[Literal["json", "ndjson"]] = None):
+    """
+    Geolocated check-ins in (createdAt, id) order, optionally only those with
+    since <= createdAt < until (Unix seconds). With `limit`, at most that many
+    are returned and, if there are more, the X-Next-Cursor header holds the
+    `cursor` to pass for the next page. Pages are read straight off the
+    (createdAt, id) indexes, so a page costs the same anywhere in the history.
+
+    With `stream`, rows are written while they are read (see stream_query),
+    so memory stays flat and the first points arrive at once. The headers go
+    out first, so there is no X-Next-Cursor: the next page's cursor is
+    "<timestamp>:<id>" of the last item.
+    """
+    query, params = geo_query(
+        "c.id, c.createdAt, c.shout, v.name as venue_name, v.lat, v.lng",
+        user_id, since, until, cursor)
+    if stream is not None:
+        if limit is not None:
+            query += "LIMIT ?"
+            params.append(limit)
+        return stream_query(query, params, checkin_geo_item, stream)
+    rows = fetch_page(query, params, limit, response)
+    return [CheckinGeo(**checkin_geo_item(row)) for row in rows]
+
+# Binary geo payload: a 12-byte header (magic, then the check-in count n and
+# the byte length of the venue name table as little-endian uint32), followed
+# by float32 lat[n], float32 lng[n], uint32 timestamp[n] and uint32 venue[n],
+# an index into the name table or NO_VENUE, then the name table as a UTF-8
+# JSON array of strings. Every array starts at a multiple of 4 bytes, so a
+# browser can view it in place as a typed array (new Float32Array(buffer,
+# offset, n)). Timestamps outside the uint32 range are left out.
+GEO_BINARY_MAGIC = b"SWG1"
+NO_VENUE = 0xFFFFFFFF
+
+@app.get("/api/checkins/geo/binary")
+def get_checkins_geo_binary(response: Response,
+                            user_id: Optional[str] = None,
+                            since: Optional[int] = None,
+                            until: Optional[int] = None,
+                            limit: Annotated[Optional[int],
+                                             Query(ge=1, le=GEO_PAGE_MAX)] = None,
+                            cursor: Optional[str] = None):
+    """
+    The check-ins of /api/checkins/geo (same parameters, paging and
+    X-Next-Cursor) as columnar typed arrays, without ids and shouts.
+    """
+    # Only timestamps that fit the uint32 column
+    since = max(since or 0, 0)
+    until = min(until, 1 << 32) if until is not None else 1 << 32
+    query, params = geo_query("c.id, c.createdAt, v.lat, v.lng, v.name",
+                              user_id, since, until, cursor)
+    rows = fetch_page(query, params, limit, response)
+    names = {}
+    columns = list(zip(*rows)) or [()] * 5
+    venues = [NO_VENUE if name is None else names.setdefault(name, len(names))
+              for name in columns[4]]
+    name_table = json.dumps(list(names), ensure_ascii=False,
+                            separators=(",", ":")).encode()
+    body = b"".join([
+        GEO_BINARY_MAGIC,
+        np.array([len(rows), len(name_table)], dtype="<u4").tobytes(),
+        np.array(columns[2], dtype="<f4").tobytes(),
+        np.array(columns[3], dtype="<f4").tobytes(),
+        np.array(columns[1], dtype="<u4").tobytes(),
+        np.array(venues, dtype="<u4").tobytes(),
+        name_table,
+    ])
+    next_cursor = response.headers.get("X-Next-Cursor")
+    return Response(content=body, media_type="application/octet-stream",
+                    headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 @app.get("/api/timeline/weekly", response_model=List[WeeklyCount])
-def get_weekly_timeline():
-    conn = get_db_connection()
-    df = pd.read_sql_query("SELECT createdAt FROM checkins ORDER BY createdAt ASC", conn)
-    conn.close()
+@cached_aggregate
+def get_weekly_timeline(user_id: Optional[str] = None):
+    with get_db_connection() as conn:
+        table = (snapshots.load_snapshot(conn, 'checkins', ['createdAt', 'userId'])
+                 if snapshots else None)
+        if table is not None:
+            # Null createdAt marks values that were not integers, as typeof()
+            # below
+            mask = pc.is_valid(table['createdAt'])
+            if user_id is not None:
+                mask = pc.and_(mask, pc.equal(table['userId'], user_id))
+            df = table.filter(mask).select(['createdAt']).to_pandas()
+        else:
+            where, params = user_filter(user_id)
+            df = pd.read_sql_query(f"""
+                SELECT createdAt FROM checkins
+                WHERE typeof(createdAt) = 'integer' AND {where}
+                ORDER BY createdAt ASC
+            """, conn, params=params)
     if df.empty: return []
-    df['createdAt'] = pd.to_numeric(df['createdAt'], errors='coerce')
-    df.dropna(subset=['createdAt'], inplace=True)
     df['datetime'] = pd.to_datetime(df['createdAt'], unit='s')
     weekly = df.set_index('datetime').resample('W').size().reset_index(name='count')
     return [WeeklyCount(week=row['datetime'].strftime('%Y-%m-%d'), count=int(row['count'])) for _, row in weekly.iterrows()]
 
+@app.get("/api/photos/{photo_id}/thumbnail")
+def get_photo_thumbnail(photo_id: str, size: int = 160):
+    """
+    Serves the smallest thumbnail from make_thumbnails.py that is at least
+    `size` pixels, or the largest one.
+    """
+    with get_db_connection() as conn:
+        try:
+            row = conn.execute("""
+                SELECT path, contentHash FROM photo_thumbnails
+                WHERE photoId = ?
+                ORDER BY size < ?, CASE WHEN size >= ? THEN size ELSE -size END
+                LIMIT 1
+            """, (photo_id, size, size)).fetchone()
+        except sqlite3.OperationalError: # make_thumbnails.py has never run
+            row = None
+    if row is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No thumbnail for this photo. Run make_thumbnails.py.")
+    path = os.path.join(os.path.dirname(DB_PATH), row['path'])
+    if not os.path.exists(path):
+        raise HTTPException(
+            status_code=404,
+            detail="Thumbnail file is missing. Run make_thumbnails.py again.")
+    # Thumbnails only change when the photo file does, which changes the hash
+    headers = {
+        "Cache-Control": "public, max-age=86400",
+        "ETag": f'"{row["contentHash"]}"',
+    }
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+# --- Map tiles ---
+# import_data.py precomputes map_clusters: check-ins counted per grid cell
+# (4 x 4 per tile) at zoom levels 0 to its CLUSTER_MAX_ZOOM. Deeper tiles are
+# cut out of the deepest level.
+MAX_TILE_ZOOM = 22
+MERCATOR_MAX_LATITUDE = 85.05112878
+
+class TileCluster(BaseModel):
+    lat: float
+    lng: float
+    count: int
+    venues: int
+    venue_name: Optional[str]
+    first_at: Optional[int]
+    last_at: Optional[int]
+
+def mercator(lat, lng):
+    """
+    Web Mercator position as fractions of the world's width, as in
+    import_data.mercator.
+    """
+    lat = max(-MERCATOR_MAX_LATITUDE, min(MERCATOR_MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    return ((lng + 180) / 360 % 1.0,
+            0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi))
+
+@cached_aggregate
+def cluster_max_zoom():
+    with get_db_connection() as conn:
+        try:
+            # The rows of all accounts ('') exist whenever any do; the key makes
+            # this one seek
+            return conn.execute(
+                "SELECT max(zoom) FROM map_clusters WHERE userId = ''").fetchone()[0]
+        except sqlite3.OperationalError: # A database imported before map clusters
+            return None
+
+# Not cached: a tile is a single primary key lookup, and there are too many
+# tiles to keep
+@app.get("/api/tiles/{z}/{x}/{y}", response_model=List[TileCluster])
+def get_tile(z: Annotated[int, Path(ge=0, le=MAX_TILE_ZOOM)], x: int, y: int,
+             user_id: Optional[str] = None):
+    """
+    The check-in clusters of map tile z/x/y (XYZ numbering), at most 16 rows
+    whatever the size of the history.
+    """
+    if not (0 <= x < 1 << z and 0 <= y < 1 << z):
+        raise HTTPException(status_code=404, detail="Tile outside the map.")
+    max_zoom = cluster_max_zoom()
+    if max_zoom is None:
+        raise HTTPException(status_code=404,
+                            detail="No map clusters. Run import_data.py again.")
+    shift = max(0, z - max_zoom)
+    with get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT count, venues, lat, lng, venueName, firstAt, lastAt
+            FROM map_clusters
+            WHERE userId = ? AND zoom = ? AND tileX = ? AND tileY = ?
+        """, (user_id or "", z - shift, x >> shift, y >> shift)).fetchall()
+    clusters = [TileCluster(lat=row['lat'], lng=row['lng'], count=row['count'],
+                            venues=row['venues'], venue_name=row['venueName'],
+                            first_at=row['firstAt'], last_at=row['lastAt'])
+                for row in rows]
+    if shift:
+        # Only the clusters of the deepest level that lie inside this smaller
+        # tile
+        size = 1 << z
+        clusters = [c for c in clusters
+                    if tuple(int(v * size) for v in mercator(c.lat, c.lng)) == (x, y)]
+    return clusters
+
 # --- Serve Frontend ---
 if os.path.exists(FRONTEND_PATH):
     app.mount("/", StaticFiles(directory=FRONTEND_PATH, html=True), name="frontend")
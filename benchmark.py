@@ -0,0 +1,249 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+import generate_sample_export
+import import_data
+
+# Benchmarks the import, the backend endpoints and the visualize.py stages
+# against synthetic exports from generate_sample_export.py, and writes the
+# throughput and latency figures to a JSON report. Datasets are generated
+# once per scale and seed and reused on later runs.
+
+# visualize.py stages, in the order main() runs them. The folium map stages
+# iterate over every row and are slow on large scales; use --visualize-stages
+# to pick a subset.
+VISUALIZE_STAGES = [
+    'plot_weekly_checkins',
+    'plot_map_animation',
+    'plot_heatmap',
+    'plot_activity_matrix',
+    'plot_top_venues',
+    'plot_shout_wordcloud',
+    'plot_unique_locations_map',
+    'calculate_stats',
+    'plot_top_cities',
+]
+
+
+@contextlib.contextmanager
+def quiet(enabled=True):
+    """Swallows the progress output of the code being measured."""
+    if not enabled:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def latency_stats(samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return {
+        'runs': len(samples),
+        'min_ms': round(samples[0] * 1000, 2),
+        'median_ms': round(statistics.median(samples) * 1000, 2),
+        'p95_ms': round(p95 * 1000, 2),
+    }
+
+
+def prepare_dataset(workdir, scale, seed):
+    dataset_dir = os.path.join(workdir, f"{scale}-seed{seed}")
+    marker = os.path.join(dataset_dir, 'counts.json')
+    if os.path.exists(marker):
+        with open(marker) as f:
+            return dataset_dir, json.load(f)
+
+    print(f"Generating {scale} check-in dataset in '{dataset_dir}'...")
+    start = time.perf_counter()
+    with quiet():
+        counts = generate_sample_export.generate(dataset_dir, scale, seed=seed)
+    with open(marker, 'w') as f:
+        json.dump(counts, f)
+    print(f"Generated in {time.perf_counter() - start:.1f}s.")
+    return dataset_dir, counts
+
+
+def bench_import(dataset_dir, import_args, verbose):
+    """
+    Runs import_data.main on a fresh database with --profile and returns its
+    stage report.
+    """
+    with working_directory(dataset_dir):
+        if os.path.exists(import_data.DATABASE_NAME):
+            os.remove(import_data.DATABASE_NAME)
+        start = time.perf_counter()
+        with quiet(not verbose):
+            import_data.main(import_args + ['--profile', 'import_profile.json'])
+        wall = time.perf_counter() - start
+        with open('import_profile.json') as f:
+            profile = json.load(f)
+
+    total = profile['stages'][-1]
+    database = os.path.join(dataset_dir, import_data.DATABASE_NAME)
+    return {
+        'args': import_args,
+        'wall_seconds': round(wall, 3),
+        'rows_written': total['rows_written'],
+        'rows_per_second': round(total['rows_written'] / wall, 1),
+        'peak_rss_mb': total['peak_rss_mb'],
+        'database_mb': round(os.path.getsize(database) / (1024 * 1024), 1),
+        'stages': profile['stages'],
+    }
+
+
+def bench_backend(dataset_dir, repeat):
+    try:
+        from backend import main as backend
+    except ImportError as e:
+        print(f"Skipping backend benchmarks: {e}")
+        return None
+
+    backend.DB_PATH = os.path.join(os.path.abspath(dataset_dir),
+                                   import_data.DATABASE_NAME)
+    endpoints = {
+        '/api/stats': backend.get_stats,
+        '/api/checkins/geo': lambda: backend.get_checkins_geo(backend.Response()),
+        '/api/checkins/geo?limit=2000':
+            lambda: backend.get_checkins_geo(backend.Response(), limit=2000),
+        '/api/timeline/weekly': backend.get_weekly_timeline,
+        '/api/tiles/2/2/1': lambda: backend.get_tile(2, 2, 1),
+    }
+    results = {}
+    for path, endpoint in endpoints.items():
+        samples = []
+        for _ in range(repeat):
+            backend.invalidate_cache() # Time the queries, not the aggregate cache
+            start = time.perf_counter()
+            response = endpoint()
+            samples.append(time.perf_counter() - start)
+        results[path] = latency_stats(samples)
+        results[path]['items'] = len(response) if isinstance(response, list) else 1
+    return results
+
+
+def bench_visualize(dataset_dir, stages):
+    try:
+        import visualize
+    except ImportError as e:
+        print(f"Skipping visualize.py benchmarks: {e}")
+        return None
+
+    visualize.DB_NAME = os.path.join(os.path.abspath(dataset_dir),
+                                     import_data.DATABASE_NAME)
+    visualize.OUTPUT_DIR = os.path.join(os.path.abspath(dataset_dir), 'visualizations')
+    visualize.ensure_output_dir()
+
+    results = {}
+    start = time.perf_counter()
+    with quiet():
+        df_checkins, df_visits = visualize.load_data()
+    results['load_data'] = round(time.perf_counter() - start, 3)
+
+    for name in stages:
+        # The stages add columns to the frame they get, so each one gets a copy
+        df = df_visits if name == 'plot_top_cities' else df_checkins
+        df = df.copy()
+        start = time.perf_counter()
+        with quiet():
+            getattr(visualize, name)(df)
+        results[name] = round(time.perf_counter() - start, 3)
+    return {'seconds': results}
+
+
+def print_summary(results):
+    print(f"\n{'scale':>10} {'import s':>9} {'rows/s':>10} {'rss MiB':>8} "
+          f"{'db MiB':>7}")
+    for run in results['runs']:
+        imp = run['import']
+        print(f"{run['scale']:>10} {imp['wall_seconds']:>9.2f} "
+              f"{imp['rows_per_second']:>10.0f} {imp['peak_rss_mb']:>8.1f} "
+              f"{imp['database_mb']:>7.1f}")
+        for path, stats in (run.get('backend') or {}).items():
+            print(f"{'':>10} {path:<28} median {stats['median_ms']:>9.1f} ms  "
+                  f"p95 {stats['p95_ms']:>9.1f} ms  ({stats['items']} items)")
+        visualize_seconds = (run.get('visualize') or {}).get('seconds') or {}
+        for name, seconds in visualize_seconds.items():
+            print(f"{'':>10} {name:<28} {seconds:>9.2f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the import, backend and visualizations on synthetic "
+                    "exports.")
+    parser.add_argument('--scales', default='10k,100k',
+                        help="Comma-separated check-in counts or names "
+                             f"({', '.join(generate_sample_export.SCALES)}). "
+                             "Default: 10k,100k.")
+    parser.add_argument('--seed', type=int, default=42,
+                        help="Dataset seed (default: 42).")
+    parser.add_argument('--workdir', default='benchmarks',
+                        help="Where datasets and databases are kept "
+                             "(default: benchmarks).")
+    parser.add_argument('--import-args', default='',
+                        help="Extra arguments for import_data.py, e.g. "
+                             "--import-args=\"--stream --workers 4\".")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Calls per backend endpoint (default: 5).")
+    parser.add_argument('--skip-backend', action='store_true',
+                        help="Do not benchmark the backend endpoints.")
+    parser.add_argument('--skip-visualize', action='store_true',
+                        help="Do not benchmark visualize.py.")
+    parser.add_argument('--visualize-stages', default=','.join(VISUALIZE_STAGES),
+                        help="Comma-separated visualize.py functions to time "
+                             "(default: all).")
+    parser.add_argument('--report', default='benchmark_results.json',
+                        help="JSON report path (default: benchmark_results.json).")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Show the import's own output.")
+    args = parser.parse_args(argv)
+
+    scales = [generate_sample_export.parse_scale(scale)
+              for scale in args.scales.split(',') if scale]
+    stages = [name for name in args.visualize_stages.split(',') if name]
+    unknown = [name for name in stages if name not in VISUALIZE_STAGES]
+    if unknown:
+        parser.error(f"Unknown visualize stages: {', '.join(unknown)}")
+
+    results = {
+        'seed': args.seed,
+        'started_at': int(time.time()),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+        'runs': [],
+    }
+    for scale in scales:
+        dataset_dir, counts = prepare_dataset(args.workdir, scale, args.seed)
+        print(f"Benchmarking {scale} check-ins...")
+        run = {'scale': scale, 'counts': counts}
+        run['import'] = bench_import(dataset_dir, args.import_args.split(),
+                                     args.verbose)
+        if not args.skip_backend:
+            run['backend'] = bench_backend(dataset_dir, args.repeat)
+        if not args.skip_visualize:
+            run['visualize'] = bench_visualize(dataset_dir, stages)
+        results['runs'].append(run)
+
+    with open(args.report, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    print(f"\nBenchmark report saved to '{args.report}'.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { 
   MapPin, 
   Calendar, 
@@ -20,6 +20,7 @@ import {
   Area
 } from 'recharts';
 import { MapContainer, TileLayer, CircleMarker, Popup } from 'react-leaflet';
+import ClusterLayer from './ClusterLayer';
 
 interface Stats {
   total_checkins: number;
@@ -42,6 +43,26 @@ interface WeeklyData {
   count: number;
 }
 
+interface User {
+  id: string;
+  display_name: string | null;
+  total_checkins: number;
+}
+
+// Check-ins per /api/checkins/geo page. The next page is requested once
+// playback gets within half a page of the end of what has been loaded.
+const GEO_PAGE_SIZE = 2000;
+
+async function fetchGeoPage(query: URLSearchParams, cursor: string | null, signal: AbortSignal) {
+  const params = new URLSearchParams(query);
+  params.set('limit', String(GEO_PAGE_SIZE));
+  if (cursor) params.set('cursor', cursor);
+  const res = await fetch(`/api/checkins/geo?${params}`, { signal });
+  if (!res.ok) throw new Error(`/api/checkins/geo: ${res.status}`);
+  const points: CheckinGeo[] = await res.json();
+  return { points, next: res.headers.get('X-Next-Cursor') };
+}
+
 function App() {
   const [stats, setStats] = useState<Stats | null>(null);
   const [timeline, setTimeline] = useState<WeeklyData[]>([]);
@@ -49,14 +70,55 @@ function App() {
   const [visiblePoints, setVisiblePoints] = useState<CheckinGeo[]>([]);
   const [isPlaying, setIsPlaying] = useState(false);
   const [playbackIndex, setPlaybackIndex] = useState(0);
+  const [users, setUsers] = useState<User[]>([]);
+  const [userId, setUserId] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
 
   useEffect(() => {
-    // Fetch initial data
-    fetch('/api/stats').then(res => res.json()).then(setStats);
-    fetch('/api/timeline/weekly').then(res => res.json()).then(setTimeline);
-    fetch('/api/checkins/geo').then(res => res.json()).then(setGeoData);
+    fetch('/api/users').then(res => res.json()).then(setUsers);
   }, []);
 
+  // Aborted when the account changes, so pages of the previous one are dropped
+  const geoRequests = useRef<AbortController | null>(null);
+  const requestedCursor = useRef<string | null>(null);
+  const userQuery = () => new URLSearchParams(userId ? { user_id: userId } : {});
+
+  useEffect(() => {
+    // Fetch the data of the selected account, or of all accounts
+    const query = userId ? `?${userQuery()}` : '';
+    const controller = new AbortController();
+    geoRequests.current = controller;
+    requestedCursor.current = null;
+    setPlaybackIndex(0);
+    setIsPlaying(false);
+    setGeoData([]);
+    setNextCursor(null);
+    fetch(`/api/stats${query}`).then(res => res.json()).then(setStats);
+    fetch(`/api/timeline/weekly${query}`).then(res => res.json()).then(setTimeline);
+    // Only the first page of the map history; playback loads the rest as it goes
+    fetchGeoPage(userQuery(), null, controller.signal)
+      .then(({ points, next }) => {
+        setGeoData(points);
+        setNextCursor(next);
+      })
+      .catch(() => {});
+    return () => controller.abort();
+  }, [userId]);
+
+  useEffect(() => {
+    if (!nextCursor || requestedCursor.current === nextCursor || playbackIndex < geoData.length - GEO_PAGE_SIZE / 2) return;
+    requestedCursor.current = nextCursor;
+    const signal = geoRequests.current!.signal;
+    fetchGeoPage(userQuery(), nextCursor, signal)
+      .then(({ points, next }) => {
+        setGeoData(prev => prev.concat(points));
+        setNextCursor(next);
+      })
+      .catch(() => {
+        if (!signal.aborted) setNextCursor(null); // Play what has been loaded
+      });
+  }, [nextCursor, playbackIndex, geoData.length]);
+
   // Animation logic
   useEffect(() => {
     let interval: any;
@@ -64,11 +126,11 @@ function App() {
       interval = setInterval(() => {
         setPlaybackIndex(prev => prev + 1);
       }, 100);
-    } else {
-      setIsPlaying(false);
+    } else if (!nextCursor) {
+      setIsPlaying(false); // Otherwise wait for the next page
     }
     return () => clearInterval(interval);
-  }, [isPlaying, playbackIndex, geoData]);
+  }, [isPlaying, playbackIndex, geoData, nextCursor]);
 
   useEffect(() => {
     setVisiblePoints(geoData.slice(0, playbackIndex));
@@ -88,6 +150,18 @@ function App() {
           </h1>
           <p className="text-gray-400">Your life, visualized through check-ins.</p>
         </div>
+        {users.length > 1 && (
+          <select
+            value={userId}
+            onChange={e => setUserId(e.target.value)}
+            className="bg-gray-900 border border-gray-800 rounded-lg px-3 py-2 text-gray-200"
+          >
+            <option value="">All accounts</option>
+            {users.map(u => (
+              <option key={u.id} value={u.id}>{u.display_name || u.id} ({u.total_checkins})</option>
+            ))}
+          </select>
+        )}
       </header>
 
       {/* Hero Stats */}
@@ -165,7 +239,7 @@ function App() {
              <div className="w-full bg-gray-800 h-1 rounded-full overflow-hidden">
                 <div 
                     className="bg-blue-500 h-full transition-all duration-300" 
-                    style={{ width: `${(playbackIndex / geoData.length) * 100}%` }}
+                    style={{ width: `${Math.min(1, playbackIndex / (nextCursor ? stats?.total_checkins || geoData.length : geoData.length)) * 100}%` }}
                 />
              </div>
           </div>
@@ -178,6 +252,8 @@ function App() {
               attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
               url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
             />
+            {/* The whole history as clusters until the playback starts */}
+            {playbackIndex === 0 && <ClusterLayer userId={userId} />}
             {visiblePoints.map((p, idx) => (
               <CircleMarker 
                 key={p.id} 
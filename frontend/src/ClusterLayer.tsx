@@ -0,0 +1,89 @@
+import { useCallback, useEffect, useRef, useState } from 'react';
+import { CircleMarker, Tooltip, useMap, useMapEvents } from 'react-leaflet';
+
+interface TileCluster {
+  lat: number;
+  lng: number;
+  count: number;
+  venues: number;
+  venue_name: string | null;
+  first_at: number | null;
+  last_at: number | null;
+}
+
+const TILE_SIZE = 256;
+
+// The tiles of the current view as z/x/y keys, with x wrapped around the
+// antimeridian and tiles beyond the poles left out.
+function visibleTiles(zoom: number, min: { x: number; y: number }, max: { x: number; y: number }) {
+  const n = 2 ** zoom;
+  const keys = new Set<string>();
+  const minY = Math.max(0, Math.floor(min.y / TILE_SIZE));
+  const maxY = Math.min(n - 1, Math.floor((max.y - 1) / TILE_SIZE));
+  const minX = Math.floor(min.x / TILE_SIZE);
+  const maxX = Math.min(minX + n - 1, Math.floor((max.x - 1) / TILE_SIZE));
+  for (let x = minX; x <= maxX; x++) {
+    for (let y = minY; y <= maxY; y++) {
+      keys.add(`${zoom}/${((x % n) + n) % n}/${y}`);
+    }
+  }
+  return [...keys];
+}
+
+// Every check-in of the account, as the clusters /api/tiles precomputes for
+// the tiles in view. The number of markers depends on the viewport (at most
+// 16 per tile), not on the size of the history.
+export default function ClusterLayer({ userId }: { userId: string }) {
+  const map = useMap();
+  const [clusters, setClusters] = useState<TileCluster[]>([]);
+  const tiles = useRef(new Map<string, TileCluster[]>());
+  const view = useRef(0); // Responses for an older view are dropped
+
+  const load = useCallback(() => {
+    const zoom = Math.round(map.getZoom());
+    const bounds = map.getPixelBounds();
+    const keys = visibleTiles(zoom, bounds.min!, bounds.max!);
+    const current = ++view.current;
+    const query = userId ? `?user_id=${encodeURIComponent(userId)}` : '';
+    Promise.all(keys.map(key => {
+      const cached = tiles.current.get(key);
+      if (cached) return cached;
+      return fetch(`/api/tiles/${key}${query}`)
+        .then(res => (res.ok ? res.json() : []))
+        .then((tile: TileCluster[]) => {
+          tiles.current.set(key, tile);
+          return tile;
+        });
+    })).then(loaded => {
+      if (current === view.current) setClusters(loaded.flat());
+    }).catch(() => {});
+  }, [map, userId]);
+
+  useEffect(() => {
+    tiles.current.clear();
+    load();
+  }, [load]);
+
+  useMapEvents({ moveend: load });
+
+  return (
+    <>
+      {clusters.map(c => (
+        <CircleMarker
+          key={`${c.lat},${c.lng}`}
+          center={[c.lat, c.lng]}
+          radius={5 + 4 * Math.log10(c.count)}
+          pathOptions={{ color: '#8b5cf6', fillColor: '#8b5cf6', fillOpacity: 0.5, weight: 1 }}
+          eventHandlers={{
+            // Zoom into a cluster of several venues to split it up
+            click: () => { if (c.venues > 1) map.setView([c.lat, c.lng], map.getZoom() + 2); },
+          }}
+        >
+          <Tooltip>
+            {c.venue_name ?? `${c.venues} venues`}: {c.count} check-in{c.count === 1 ? '' : 's'}
+          </Tooltip>
+        </CircleMarker>
+      ))}
+    </>
+  );
+}
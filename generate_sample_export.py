@@ -0,0 +1,365 @@
+import argparse
+import itertools
+import json
+import os
+import random
+
+# Generates a synthetic Swarm/Foursquare export with the same file layout and
+# item fields that import_data.py reads, so imports, the backend and
+# visualize.py can be exercised and benchmarked without a real export.
+# Output is deterministic for a given seed and scale.
+
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+USER_ID = '12345678'
+START_TIME = 1325376000 # 2012-01-01
+END_TIME = 1704067200 # 2024-01-01
+
+# Check-ins in one checkins<N>.json file, like the split files of real exports
+CHECKINS_PER_FILE = 250_000
+
+# Items per check-in for the other files
+PHOTO_RATIO = 0.3
+VISIT_RATIO = 0.5
+TIP_RATIO = 0.01
+VENUE_RATIO = 0.05
+FRIEND_COUNT = 200
+
+CITIES = [
+    # name, state, country code, lat, lng
+    ('Kyiv', 'Kyiv City', 'UA', 50.4501, 30.5234),
+    ('Lviv', 'Lviv Oblast', 'UA', 49.8397, 24.0297),
+    ('Berlin', 'Berlin', 'DE', 52.5200, 13.4050),
+    ('London', 'England', 'GB', 51.5074, -0.1278),
+    ('New York', 'NY', 'US', 40.7128, -74.0060),
+    ('San Francisco', 'CA', 'US', 37.7749, -122.4194),
+    ('Tokyo', 'Tokyo', 'JP', 35.6762, 139.6503),
+    ('Barcelona', 'Catalonia', 'ES', 41.3874, 2.1686),
+]
+CITY_WEIGHTS = [30, 10, 12, 8, 8, 4, 3, 5]
+
+VENUE_KINDS = ['Coffee', 'Bar', 'Park', 'Museum', 'Office', 'Gym', 'Restaurant',
+               'Bakery', 'Station', 'Airport']
+STREETS = ['Main St', 'Market St', 'High St', 'Station Rd', 'Park Ave', 'River Rd',
+           'Church St', 'Mill Ln']
+SHOUT_WORDS = ['coffee', 'finally', 'friends', 'lunch', 'work', 'weekend', 'rain',
+               'sunny', 'meeting', 'again', 'best', 'view', 'beer', 'late', 'early',
+               'trip', 'home', 'music', 'тут', 'café']
+TIP_WORDS = ['great', 'try', 'the', 'cheesecake', 'wifi', 'is', 'slow', 'friendly',
+             'staff', 'busy', 'quiet', 'on', 'mondays']
+
+
+def parse_scale(value):
+    """Accepts a SCALES name (10k, 1m, ...) or a plain number of check-ins."""
+    key = value.lower()
+    if key in SCALES:
+        return SCALES[key]
+    try:
+        return int(key.replace('_', ''))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"Unknown scale '{value}'. Use one of {', '.join(SCALES)} or a number.")
+
+
+def _rng(seed, name):
+    # One generator per file, so each file's content does not depend on the others
+    return random.Random(f"{seed}:{name}")
+
+
+def _hex_id(rng, length=24):
+    return f"{rng.getrandbits(length * 4):0{length}x}"
+
+
+def _write_items(path, items, count, key='items'):
+    """
+    Writes {"count": count, key: [...]} one item at a time, so memory stays
+    flat at any scale.
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'{{"count": {count}, "{key}": [')
+        for i, item in enumerate(items):
+            if i:
+                f.write(',\n')
+            f.write(json.dumps(item, ensure_ascii=False))
+        f.write(']}\n')
+
+
+def make_venues(seed, count):
+    rng = _rng(seed, 'venues')
+    venues = []
+    for i in range(count):
+        city, state, cc, lat, lng = rng.choices(CITIES, CITY_WEIGHTS)[0]
+        address = f"{rng.randint(1, 200)} {rng.choice(STREETS)}"
+        venue_lat = round(lat + rng.gauss(0, 0.05), 6)
+        venue_lng = round(lng + rng.gauss(0, 0.08), 6)
+        venues.append({
+            'id': _hex_id(rng),
+            'name': f"{rng.choice(VENUE_KINDS)} {i}",
+            'location': {
+                'address': address,
+                'lat': venue_lat,
+                'lng': venue_lng,
+                'postalCode': f"{rng.randint(10000, 99999)}",
+                'cc': cc,
+                'city': city,
+                'state': state,
+                'formattedAddress': [address, city, state],
+            },
+            'url': f"https://example.com/venue/{i}" if i % 4 == 0 else None,
+        })
+    return venues
+
+
+def _timestamps(rng, count):
+    """count sorted unix timestamps spread over START_TIME..END_TIME."""
+    mean_gap = (END_TIME - START_TIME) / max(count, 1)
+    now = float(START_TIME)
+    for _ in range(count):
+        now += rng.expovariate(1 / mean_gap)
+        yield int(now)
+
+
+def _checkin_id(index, created_at):
+    return f"{created_at:08x}{index:016x}"
+
+
+def checkin_items(seed, count, venues):
+    rng = _rng(seed, 'checkins')
+    # A few favourite venues get most check-ins, like a real history
+    cum_weights = list(itertools.accumulate(1 / (rank + 1)
+                                            for rank in range(len(venues))))
+    for i, created_at in enumerate(_timestamps(_rng(seed, 'checkin-times'), count)):
+        venue = rng.choices(venues, cum_weights=cum_weights)[0]
+        item = {
+            'id': _checkin_id(i, created_at),
+            'createdAt': created_at,
+            'type': 'checkin',
+            'timeZoneOffset': 120,
+            'timeZone': 'Europe/Kiev',
+            'venue': venue,
+            'likes': {'count': 0, 'groups': []},
+            'isMayor': False,
+        }
+        if rng.random() < 0.2:
+            item['shout'] = ' '.join(rng.choices(SHOUT_WORDS, k=rng.randint(1, 8)))
+        yield item
+
+
+def _segment(marker, payload):
+    return bytes([0xFF, marker]) + (len(payload) + 2).to_bytes(2, 'big') + payload
+
+
+def placeholder_jpeg(width, height, shade):
+    """
+    A valid baseline JPEG of one flat grey, small at any size: a single
+    grayscale component whose first block sets the DC value (shade, 0-255)
+    and every other block repeats it, so each 8 x 8 block costs 3 bits.
+    """
+    dc = (shade - 128) * 8
+    category = abs(dc).bit_length()
+    blocks = -(-width // 8) * -(-height // 8)
+    bits = '01' if category else '00' # DC code for the first block's category
+    if category:
+        bits += format(dc if dc > 0 else dc + (1 << category) - 1, f'0{category}b')
+    bits += '0' + '000' * (blocks - 1) # EOB, then DC difference 0 and EOB per block
+    bits += '1' * (-len(bits) % 8)
+    data = int(bits, 2).to_bytes(len(bits) // 8, 'big').replace(b'\xff', b'\xff\x00')
+    return b''.join([
+        b'\xff\xd8',
+        _segment(0xDB, bytes(1) + bytes([1]) * 64), # Quantization table of ones
+        _segment(0xC0, bytes([8]) + height.to_bytes(2, 'big') + width.to_bytes(2, 'big')
+                 + bytes([1, 1, 0x11, 0])),
+        # DC codes: '00' for category 0, '01' for the first block's category
+        _segment(0xC4, bytes([0x00, 0, 2] + [0] * 14 + [0, category or 1])),
+        _segment(0xC4, bytes([0x10, 1] + [0] * 15 + [0x00])), # AC: only EOB, code '0'
+        _segment(0xDA, bytes([1, 1, 0x00, 0, 63, 0])),
+        data,
+        b'\xff\xd9',
+    ])
+
+
+def photo_items(seed, count, checkin_count, user_id=USER_ID):
+    # Replays the check-in timestamps, so every photo links to a generated
+    # check-in, spreading the photos evenly over the history
+    rng = _rng(seed, 'photos')
+    step = checkin_count / max(count, 1)
+    next_photo = 0
+    timestamps = _timestamps(_rng(seed, 'checkin-times'), checkin_count)
+    for i, created_at in enumerate(timestamps):
+        if next_photo >= count:
+            break
+        if i < int(next_photo * step):
+            continue
+        next_photo += 1
+        width, height = rng.choice([(1440, 1920), (1920, 1440), (1080, 1080)])
+        yield {
+            'id': _hex_id(rng),
+            'createdAt': created_at + rng.randint(0, 600),
+            'fullUrl': f"https://fastly.4sqi.net/img/general/original/{next_photo}.jpg",
+            'width': width,
+            'height': height,
+            'relatedItemUrl': f"https://www.swarmapp.com/user/{user_id}/checkin/"
+                              f"{_checkin_id(i, created_at)}",
+        }
+
+
+def visit_items(seed, count, user_id=USER_ID):
+    rng = _rng(seed, 'visits')
+    for created_at in _timestamps(rng, count):
+        city, state, cc, lat, lng = rng.choices(CITIES, CITY_WEIGHTS)[0]
+        yield {
+            'id': _hex_id(rng),
+            'userId': user_id,
+            'timeArrived': created_at,
+            'timeDeparted': created_at + rng.randint(300, 4 * 3600),
+            'os': 'iOS',
+            'osVersion': '17.1',
+            'deviceModel': 'iPhone15,2',
+            'isTraveling': cc != 'UA',
+            'latitude': round(lat + rng.gauss(0, 0.05), 6),
+            'longitude': round(lng + rng.gauss(0, 0.08), 6),
+            'city': city,
+            'state': state,
+            'countryCode': cc,
+            'locationType': rng.choice(['home', 'work', 'other', 'other']),
+        }
+
+
+def tip_items(seed, count, venues, user_id=USER_ID):
+    rng = _rng(seed, 'tips')
+    for created_at in _timestamps(rng, count):
+        venue = rng.choice(venues)
+        tip_id = _hex_id(rng)
+        yield {
+            'id': tip_id,
+            'createdAt': created_at,
+            'text': ' '.join(rng.choices(TIP_WORDS, k=rng.randint(3, 12))),
+            'type': 'user',
+            'canonicalUrl': f"https://foursquare.com/item/{tip_id}",
+            'viewCount': rng.randint(0, 500),
+            'agreeCount': rng.randint(0, 20),
+            'disagreeCount': rng.randint(0, 3),
+            'user': {'id': user_id},
+            'venue': {'id': venue['id'], 'name': venue['name']},
+        }
+
+
+def users_data(seed, user_id=USER_ID):
+    rng = _rng(seed, 'users')
+    friends = [{
+        'id': str(rng.randint(10_000_000, 99_999_999)),
+        'firstName': f"Friend{i}",
+        'lastName': rng.choice(['Smith', 'Kovalenko', 'Müller', 'Tanaka']),
+        'canonicalUrl': f"https://foursquare.com/user/{i}",
+    } for i in range(FRIEND_COUNT)]
+    return {
+        'self': {
+            'id': user_id,
+            'firstName': 'Sample',
+            'lastName': 'User',
+            'email': 'sample@example.com',
+            'gender': 'none',
+            'homeCity': 'Kyiv, Ukraine',
+            'bio': '',
+            'contact': {
+                'phone': '+380000000000',
+                'verifiedPhone': 'true',
+                'verifiedEmail': 'true',
+            },
+            'photo': {
+                'prefix': 'https://fastly.4sqi.net/img/user/',
+                'suffix': '/sample.jpg',
+            },
+            'birthday': 631152000,
+            'displayName': 'Sample U.',
+            'tips': {'count': 0},
+            'lists': {'groups': [{'type': 'created', 'count': 3}]},
+        },
+        'friends': {'count': len(friends), 'items': friends},
+    }
+
+
+def generate(out_dir, checkins, seed=42, pix=False, user_id=USER_ID):
+    """
+    Writes a synthetic export with `checkins` check-ins into out_dir and
+    returns the item counts.
+
+    user_id is the account the export belongs to; give each export a different
+    one to try multi-account imports.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    counts = {
+        'checkins': checkins,
+        'photos': int(checkins * PHOTO_RATIO),
+        'visits': int(checkins * VISIT_RATIO),
+        'tips': int(checkins * TIP_RATIO),
+        'venues': max(1, int(checkins * VENUE_RATIO)),
+        'friends': FRIEND_COUNT,
+    }
+    venues = make_venues(seed, counts['venues'])
+
+    items = checkin_items(seed, checkins, venues)
+    files = max(1, -(-checkins // CHECKINS_PER_FILE))
+    for number in range(1, files + 1):
+        size = min(CHECKINS_PER_FILE, checkins - (number - 1) * CHECKINS_PER_FILE)
+        # A single file keeps the plain name, as in small exports
+        name = 'checkins.json' if files == 1 else f"checkins{number}.json"
+        _write_items(os.path.join(out_dir, name), (next(items) for _ in range(size)),
+                     size)
+        print(f"Wrote {size} check-ins to {name}")
+
+    _write_items(os.path.join(out_dir, 'photos.json'),
+                 photo_items(seed, counts['photos'], checkins, user_id),
+                 counts['photos'])
+    _write_items(os.path.join(out_dir, 'visits.json'),
+                 visit_items(seed, counts['visits'], user_id), counts['visits'])
+    _write_items(os.path.join(out_dir, 'tips.json'),
+                 tip_items(seed, counts['tips'], venues, user_id), counts['tips'])
+    with open(os.path.join(out_dir, 'users.json'), 'w', encoding='utf-8') as f:
+        json.dump(users_data(seed, user_id), f, ensure_ascii=False)
+
+    if pix:
+        # Decodable placeholder images for every tenth photo, so photo paths
+        # partly resolve and make_thumbnails.py has work to do. They are a
+        # quarter of the photo's size in each direction to keep the export
+        # small, in one of 256 shades so their contents differ.
+        pix_dir = os.path.join(out_dir, 'pix')
+        os.makedirs(pix_dir, exist_ok=True)
+        for i, photo in enumerate(photo_items(seed, counts['photos'], checkins)):
+            if i % 10 == 0:
+                image = placeholder_jpeg(photo['width'] // 4, photo['height'] // 4,
+                                         int(photo['id'][:2], 16))
+                with open(os.path.join(pix_dir, f"{photo['id']}.jpg"), 'wb') as f:
+                    f.write(image)
+
+    print(f"Sample export written to '{out_dir}': "
+          + ', '.join(f"{count} {name}" for name, count in counts.items()))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate a deterministic synthetic Swarm export for testing and "
+                    "benchmarks.")
+    parser.add_argument('scale', type=parse_scale,
+                        help=f"Number of check-ins, or one of {', '.join(SCALES)}.")
+    parser.add_argument('--out', default='sample_export',
+                        help="Output directory (default: sample_export).")
+    parser.add_argument('--seed', type=int, default=42,
+                        help="Random seed; the same seed and scale give identical "
+                             "files.")
+    parser.add_argument('--pix', action='store_true',
+                        help="Also write placeholder images into pix/ for some photos.")
+    parser.add_argument('--user-id', default=USER_ID,
+                        help=f"Account id of the export owner (default: {USER_ID}).")
+    args = parser.parse_args(argv)
+    generate(args.out, args.scale, seed=args.seed, pix=args.pix, user_id=args.user_id)
+
+
+if __name__ == '__main__':
+    main()
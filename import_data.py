@@ -1,44 +1,1019 @@
-
-import sqlite3
+import argparse
+import codecs
+import gzip
+import hashlib
+import itertools
 import json
+import math
+import multiprocessing
 import os
 import re
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from operator import itemgetter
+from queue import Empty
+
+import snapshots
+
+try:
+    import ijson  # Optional: C-backed incremental parser for --stream
+except ImportError:
+    ijson = None
+
+try:
+    import zstandard  # Optional: needed only for .json.zst export files
+except ImportError:
+    zstandard = None
 
 DATABASE_NAME = 'foursquare_data.db'
 PIX_DIR = 'pix' # Directory where images are stored
 
-def setup_database():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-
-    # Create checkins table
-    cursor.execute('''
+# Streaming mode (--stream) reads export files in chunks of this many bytes.
+# Peak memory per file is roughly STREAM_CHUNK_SIZE plus the largest single
+# item in the array, independent of the file size.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_JSON_NUMBER_TAIL = re.compile(r'[0-9.eE+-]*')
+_json_decoder = json.JSONDecoder()
+
+
+class _JsonStream:
+    """Chunked reader that decodes one JSON value at a time from a binary file."""
+
+    def __init__(self, f, chunk_size=STREAM_CHUNK_SIZE, offset=0):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.offset = offset # File offset of buf[0]
+
+    def _fill(self):
+        # Drop what has been consumed, then read at least as much as is still
+        # buffered so an item larger than one chunk is retried O(log n) times.
+        if self.pos:
+            self.offset += len(self.buf[:self.pos].encode('utf-8'))
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        if self.eof:
+            return False
+        chunk = self.f.read(max(self.chunk_size, len(self.buf)))
+        if not chunk:
+            self.eof = True
+            self.buf += self.decoder.decode(b'', final=True)
+            return False
+        self.buf += self.decoder.decode(chunk)
+        return True
+
+    def tell(self):
+        """File offset of the next character to be read."""
+        return self.offset + len(self.buf[:self.pos].encode('utf-8'))
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            self.pos = _JSON_WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r} in streamed JSON")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut by the end of the buffer decodes as its prefix
+            # ('2.' as 2): if only number characters follow, read on.
+            is_number = (isinstance(value, (int, float))
+                         and not isinstance(value, bool))
+            if (is_number and _JSON_NUMBER_TAIL.fullmatch(self.buf, end)
+                    and self._fill()):
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(f, key='items', chunk_size=STREAM_CHUNK_SIZE, resume=None,
+                    tell=None):
+    """
+    Yields the elements of the top-level `key` array of a JSON object one at a
+    time from the binary file `f`, without loading the whole document.
+    Top-level values that precede `key` are decoded and discarded one by one.
+
+    `resume` is an (items, offset) checkpoint: the first `items` elements are
+    skipped, by seeking straight to the byte `offset` just past them when it
+    is known. If `tell` is a list, tell[0] becomes a function returning the
+    byte offset just past the last yielded element, or stays None when that
+    is unknown (ijson parsing).
+    """
+    skip, offset = resume or (0, None)
+    if tell is not None:
+        tell[:] = [None]
+    if ijson is not None or (skip and offset is None):
+        if ijson is not None:
+            items = ijson.items(f, f'{key}.item', use_float=True)
+        else:
+            items = iter_json_items(f, key, chunk_size)
+        yield from itertools.islice(items, skip, None)
+        return
+
+    if skip:
+        f.seek(offset)
+        stream = _JsonStream(f, chunk_size, offset)
+        if tell is not None:
+            tell[0] = stream.tell
+        yield from _iter_array_tail(stream, key) # Positioned right after an element
+        return
+
+    stream = _JsonStream(f, chunk_size)
+    if tell is not None:
+        tell[0] = stream.tell
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            stream.pos += 1
+            if stream.peek() == ']':
+                return
+            yield stream.value()
+            yield from _iter_array_tail(stream, key)
+            return
+        stream.value()
+        separator = stream.peek()
+        stream.pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or '}}' but found {separator!r} "
+                             "in streamed JSON")
+
+
+def _iter_array_tail(stream, key):
+    """Yields the remaining elements of an array, starting after an element."""
+    while True:
+        separator = stream.peek()
+        stream.pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or ']' but found {separator!r} "
+                             f"in '{key}' array")
+        yield stream.value()
+
+
+# Export files may be plain or compressed; the suffix picks the decompressor.
+EXPORT_SUFFIXES = ('.json', '.json.gz', '.json.zst')
+
+
+class ExportReader:
+    """
+    Finds and opens export files in a directory or directly inside a .zip
+    archive, as downloaded from Swarm. Files may be plain .json or .json.gz /
+    .json.zst, and are decompressed as a stream while they are parsed, so
+    nothing is extracted to disk.
+
+    Files are addressed by name (e.g. 'checkins1.json.gz'); members of a zip
+    are matched by their base name, whatever folder they sit in. `user_id` is
+    the account the export belongs to, stored with rows of USER_TABLES.
+    """
+
+    def __init__(self, path='.', user_id=None):
+        self.path = path
+        self.user_id = user_id # Owner of the export, see read_user_id()
+        self.zip = None
+        self.members = {}
+        if os.path.isfile(path) and zipfile.is_zipfile(path):
+            self.zip = zipfile.ZipFile(path)
+            for info in sorted(self.zip.infolist(), key=lambda info: info.filename):
+                name = os.path.basename(info.filename)
+                if (name and not info.is_dir()
+                        and not info.filename.startswith('__MACOSX/')):
+                    self.members.setdefault(name, info)
+        elif not os.path.isdir(path):
+            raise FileNotFoundError(f"Export source '{path}' is neither a directory "
+                                    "nor a zip archive.")
+
+    def names(self):
+        names = self.members if self.zip else os.listdir(self.path)
+        return sorted(name for name in names if name.endswith(EXPORT_SUFFIXES))
+
+    def list(self, prefix):
+        return [name for name in self.names() if name.startswith(prefix)]
+
+    def find(self, filename):
+        """
+        Returns the name under which `filename` (e.g. 'visits.json') exists,
+        compressed or not, or None.
+        """
+        names = set(self.names())
+        for name in (filename, f'{filename}.gz', f'{filename}.zst'):
+            if name in names:
+                return name
+        return None
+
+    def key(self, name):
+        """Stable identifier of a file for the import manifest."""
+        if self.zip:
+            return f'{os.path.abspath(self.path)}/{self.members[name].filename}'
+        return os.path.abspath(os.path.join(self.path, name))
+
+    def stat(self, name):
+        """
+        Returns (size, mtime, digest) where digest is a function computing a
+        content hash.
+        """
+        if self.zip:
+            info = self.members[name]
+            # The archive already stores a checksum of every member
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            return info.file_size, mtime, lambda: f'crc32:{info.CRC:08x}'
+        path = os.path.join(self.path, name)
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime, lambda: file_sha256(path)
+
+    @contextmanager
+    def open(self, name):
+        """Opens a file for binary reading, decompressing it on the fly."""
+        with ExitStack() as stack:
+            if self.zip:
+                f = stack.enter_context(self.zip.open(self.members[name]))
+            else:
+                f = stack.enter_context(open(os.path.join(self.path, name), 'rb'))
+            if name.endswith('.gz'):
+                f = stack.enter_context(gzip.GzipFile(fileobj=f))
+            elif name.endswith('.zst'):
+                if zstandard is None:
+                    raise RuntimeError(f"{name} is zstd-compressed; install the "
+                                       "'zstandard' package to read it.")
+                f = stack.enter_context(zstandard.ZstdDecompressor().stream_reader(f))
+            yield f
+
+    def read_user_id(self):
+        """
+        Sets and returns user_id from users.json ('self.id'), or None if the
+        export has none.
+        """
+        filename = self.find('users.json')
+        if filename:
+            with self.open(filename) as f:
+                self.user_id = json.load(f).get('self', {}).get('id')
+        return self.user_id
+
+    def close(self):
+        if self.zip:
+            self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+@contextmanager
+def open_items(export, filename, key='items', stream=False, resume=None, tell=None):
+    """
+    Opens an export file of the ExportReader `export` and yields an iterable
+    over its `key` array, or over the whole document as a single item when
+    key is None.
+
+    By default the whole file is parsed with json.load. With stream=True the
+    items are decoded incrementally (see STREAM_CHUNK_SIZE for the memory bound).
+    `resume` and `tell` are as for iter_json_items; without streaming only the
+    item count of `resume` is used.
+    """
+    with export.open(filename) as f:
+        if not stream or key is None:
+            if tell is not None:
+                tell[:] = [None]
+            data = json.load(f)
+            items = [data] if key is None else data.get(key, [])
+            yield items[resume[0]:] if resume else items
+        else:
+            yield iter_json_items(f, key, resume=resume, tell=tell)
+
+
+# Rows are buffered per table and written with executemany in batches of this size.
+BATCH_SIZE = 5000
+
+# Connection settings applied for the duration of an import and restored afterwards.
+# The import is a single writer that can simply be re-run, so durability against
+# power loss is traded for speed: no fsync, bigger page cache. The rollback journal
+# stays on disk, so a killed import leaves a hot journal that the next connection
+# rolls back to the last checkpoint, and --resume can continue from there.
+IMPORT_PRAGMAS = {
+    'journal_mode': 'TRUNCATE',
+    'synchronous': 'OFF',
+    'cache_size': -131072, # Negative means KiB, i.e. a 128 MiB page cache
+    'temp_store': 'MEMORY',
+}
+# A --staged build is thrown away if it fails, so its journal can live in memory;
+# killing the process mid-transaction may corrupt the file, never the live one.
+STAGED_PRAGMAS = dict(IMPORT_PRAGMAS, journal_mode='MEMORY')
+
+# --watch imports into the database the dashboard is reading. watch() puts
+# it in WAL mode, which lets readers carry on during each write transaction
+# and stays set afterwards; NORMAL sync keeps it consistent after a crash.
+WATCH_PRAGMAS = dict(IMPORT_PRAGMAS, synchronous='NORMAL')
+WATCH_INTERVAL = 30 # Seconds between polls of the sources
+WATCH_CHECKPOINT_ITEMS = 5_000 # Items per transaction, so each commit stays small
+NOTIFY_URL = 'http://localhost:8000/api/cache/invalidate'
+
+
+@contextmanager
+def import_pragmas(conn, pragmas=IMPORT_PRAGMAS):
+    """Applies `pragmas` to `conn` and restores the previous values on exit."""
+    if conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+        # Leaving WAL needs exclusive access, which the dashboard's connections
+        # to a watched database prevent; WAL is safe to import in as it is
+        pragmas = {name: value for name, value in pragmas.items()
+                   if name != 'journal_mode'}
+    previous = {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in pragmas}
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    try:
+        yield conn
+    finally:
+        conn.commit()
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+
+
+def _staging_file():
+    # Next to the live database, so os.replace() stays on one file system
+    directory = os.path.dirname(os.path.abspath(DATABASE_NAME))
+    fd, path = tempfile.mkstemp(prefix=f'.{os.path.basename(DATABASE_NAME)}.',
+                                suffix='.staging', dir=directory)
+    os.close(fd)
+    if os.path.exists(DATABASE_NAME):
+        shutil.copymode(DATABASE_NAME, path)
+    else:
+        os.chmod(path, 0o644)
+    return path
+
+
+def open_staging_database(mode):
+    """
+    Opens the database an import --staged into 'memory' or a temporary 'file'
+    is built in, seeded with the current contents of DATABASE_NAME through the
+    backup API so incremental re-imports keep working.
+
+    Returns (conn, path), path being None for an in-memory database.
+    """
+    path = ':memory:' if mode == 'memory' else _staging_file()
+    conn = sqlite3.connect(path)
+    if os.path.exists(DATABASE_NAME):
+        live = sqlite3.connect(DATABASE_NAME)
+        try:
+            live.backup(conn)
+        finally:
+            live.close()
+    print(f"Staging the import in {'memory' if path == ':memory:' else path}.")
+    return conn, None if path == ':memory:' else path
+
+
+def publish_database(conn, path):
+    """
+    Replaces DATABASE_NAME with the staged database in one atomic rename and
+    closes `conn`. An in-memory database is first written to a temporary file
+    with the backup API. The file is fsynced once, here, instead of on every
+    commit during the build. Readers see either the old or the new database;
+    connections opened before the rename keep reading the old one.
+    """
+    if path is None:
+        path = _staging_file()
+        target = sqlite3.connect(path)
+        try:
+            conn.backup(target)
+            target.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            target.close()
+    else:
+        # The published file must not be in WAL mode: the live database's -wal
+        # file stays behind after the rename and would be read as belonging to it
+        conn.execute('PRAGMA journal_mode = DELETE')
+    conn.close()
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+    if os.path.exists(DATABASE_NAME):
+        # Move what a --watch import left in the WAL into the old file and
+        # empty the WAL, so no stale frames are applied to the new one
+        live = sqlite3.connect(DATABASE_NAME)
+        try:
+            live.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            live.close()
+    os.replace(path, DATABASE_NAME)
+    print(f"Published the staged import to '{DATABASE_NAME}'.")
+
+
+class BulkLoader:
+    """
+    Buffers rows for one table and writes them with executemany in batches of
+    `batch_size`, all inside a single transaction that is committed when the
+    loader is closed. Used as a context manager; an exception rolls it back.
+
+    `written` counts the rows SQLite actually inserted (ignored duplicates
+    excluded). If a batch fails, it is replayed row by row so only the
+    offending rows are reported and skipped.
+
+    `watermark` is an optional (column, value) pair from ImportManifest.watermark:
+    rows whose column is at or below value were imported by an earlier run and
+    are dropped before reaching SQLite. `high_water` tracks the newest value added.
+
+    With a RowMerger (`merger`), rows at or below the watermark, rows without
+    a timestamp and, with merge_all=True, every row are checked against it
+    instead: identical ones are dropped, changed ones are written as upserts
+    and counted in `updated`. `rank` orders the exports of one run for it.
+
+    `received` counts every row passed to add(), including watermark skips.
+    """
+
+    def __init__(self, conn, table, columns=None, verb='INSERT OR IGNORE', label=None,
+                 sql=None, batch_size=BATCH_SIZE, watermark=None, merger=None,
+                 merge_all=False, rank=0, profiled=True):
+        self.conn = conn
+        self.table = table
+        self.label = label or table
+        self.batch_size = batch_size
+        self.sql = sql or (f"{verb} INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join('?' * len(columns))})")
+        self.rows = []
+        self.updates = []
+        self.received = 0
+        self.written = 0
+        self.skipped = 0
+        self.watermark_index = columns.index(watermark[0]) if watermark else None
+        self.watermark = watermark[1] if watermark else None
+        self.high_water = None
+        self.merger = merger
+        self.merge_all = (merger is not None
+                          and (merge_all or self.watermark_index is None))
+        self.rank = rank
+        self.updated = 0
+        self.identical = 0
+        self.superseded = 0
+        if profiled and _profiled_loaders is not None:
+            _profiled_loaders.append(self)
+
+    def add(self, row):
+        self.received += 1
+        merge = self.merge_all
+        if self.watermark_index is not None:
+            stamp = _as_number(row[self.watermark_index])
+            if stamp is None:
+                merge = self.merger is not None
+            elif self.watermark is not None and stamp <= self.watermark:
+                if self.merger is None:
+                    self.skipped += 1
+                    return
+                merge = True
+            elif self.high_water is None or stamp > self.high_water:
+                self.high_water = stamp
+        if merge:
+            state = self.merger.classify(row, self.rank)
+            if state == 'identical':
+                self.identical += 1
+                return
+            if state == 'superseded':
+                self.superseded += 1
+                return
+            if state == 'updated':
+                self.updates.append(row)
+                if len(self.updates) >= self.batch_size:
+                    self.flush()
+                return
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def _execute(self, sql, rows):
+        """
+        Runs sql for every row and returns the rows changed, replaying a failed
+        batch row by row.
+        """
+        changed = 0
+        self.conn.execute('SAVEPOINT bulk_batch')
+        try:
+            changed = self.conn.executemany(sql, rows).rowcount
+        except sqlite3.Error:
+            self.conn.execute('ROLLBACK TO bulk_batch')
+            for row in rows:
+                try:
+                    changed += self.conn.execute(sql, row).rowcount
+                except sqlite3.Error as e:
+                    print(f"Error importing {self.label} {row[0]}: {e}")
+        self.conn.execute('RELEASE bulk_batch')
+        return changed
+
+    def flush(self):
+        if not self.rows and not self.updates:
+            return
+        if not self.conn.in_transaction:
+            self.conn.execute('BEGIN')
+        if self.rows:
+            self.written += self._execute(self.sql, self.rows)
+            self.rows = []
+        if self.updates:
+            self.updated += self._execute(self.merger.upsert_sql, self.updates)
+            self.updates = []
+
+    def close(self):
+        self.flush()
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.rows = []
+            self.updates = []
+            self.conn.rollback()
+        return False
+
+
+# Loaders created while an ImportProfiler stage is running register here so the
+# stage can report how many rows it parsed and wrote. Stages that count their
+# rows themselves register a _StageRows.
+_profiled_loaders = None
+_StageRows = namedtuple('_StageRows', 'table received written updated')
+
+
+def _max_rss_mb(who=resource.RUSAGE_SELF):
+    """
+    Peak resident set size of this process, or of its largest finished child
+    with RUSAGE_CHILDREN, in MiB. That of this process is the lifetime peak
+    except on Linux, where _reset_peak_rss() resets it too.
+    """
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def _reset_peak_rss():
+    """
+    Resets this process's peak RSS (VmHWM) to its current RSS, so
+    _peak_rss_mb() measures from here. Only Linux supports this; returns
+    whether it worked.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process since _reset_peak_rss(), in MiB."""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024 # In kB
+    return _max_rss_mb()
+
+
+def _children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class ImportProfiler:
+    """
+    Records wall time, CPU time, rows parsed/written, rows per second and peak
+    memory for each import stage (--profile). Stages that load several tables
+    at once (check-ins and photos are parsed in one pool) also break their
+    rows down per table.
+
+    CPU time includes parse worker processes once they have exited. Peak RSS is
+    the importer's high-water mark during the stage, or that of a parse worker
+    of the stage if larger; workers are only seen once they have exited, and
+    only when they exceed every earlier worker. Where the high-water mark cannot
+    be reset (not Linux), it is the peak since the import started. The total
+    is the peak of the whole run. When disabled, run() just calls the stage
+    function.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started_at = int(time.time())
+        self.started = time.perf_counter()
+        self.started_cpu = time.process_time() + _children_cpu_seconds()
+        self.stages = []
+
+    def run(self, name, func, *args, **kwargs):
+        global _profiled_loaders
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        loaders = _profiled_loaders = []
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        children_cpu = _children_cpu_seconds()
+        children_rss = _max_rss_mb(resource.RUSAGE_CHILDREN)
+        reset = _reset_peak_rss()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _profiled_loaders = None
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu + _children_cpu_seconds() - children_cpu
+            tables = {}
+            for loader in loaders: # One loader per table and export
+                counts = tables.setdefault(loader.table, [0, 0])
+                counts[0] += loader.received
+                counts[1] += loader.written + loader.updated
+            peak_rss = _peak_rss_mb() if reset else _max_rss_mb()
+            if _max_rss_mb(resource.RUSAGE_CHILDREN) > children_rss:
+                # A worker of this stage is the largest child so far
+                peak_rss = max(peak_rss, _max_rss_mb(resource.RUSAGE_CHILDREN))
+            self._record(name, wall, cpu,
+                         sum(parsed for parsed, _ in tables.values()),
+                         sum(written for _, written in tables.values()),
+                         tables if len(tables) > 1 else None, peak_rss)
+
+    def _record(self, name, wall, cpu, parsed, written, tables, peak_rss):
+        stage = {
+            'stage': name,
+            'wall_seconds': round(wall, 4),
+            'cpu_seconds': round(cpu, 4),
+            'rows_parsed': parsed,
+            'rows_written': written,
+            'rows_per_second': round(parsed / wall, 1) if wall > 0 else 0.0,
+            'peak_rss_mb': round(peak_rss, 1),
+        }
+        if tables:
+            stage['tables'] = [
+                {'table': table, 'rows_parsed': parsed, 'rows_written': written}
+                for table, (parsed, written) in tables.items()]
+        self.stages.append(stage)
+
+    def report(self, conn, path):
+        """
+        Adds a 'total' stage, prints a summary and saves it to `path` and the
+        import_runs table.
+        """
+        if not self.enabled:
+            return
+        stages = list(self.stages)
+        wall = time.perf_counter() - self.started
+        cpu = time.process_time() + _children_cpu_seconds() - self.started_cpu
+        # Resetting the high-water mark resets ru_maxrss too, so the run's peak
+        # is the largest of the stages'
+        self._record('total', wall, cpu,
+                     sum(stage['rows_parsed'] for stage in stages),
+                     sum(stage['rows_written'] for stage in stages), None,
+                     max([stage['peak_rss_mb'] for stage in stages]
+                         + [_max_rss_mb(), _max_rss_mb(resource.RUSAGE_CHILDREN)]))
+
+        print(f"{'stage':<20} {'wall s':>8} {'cpu s':>8} {'parsed':>10} "
+              f"{'written':>10} {'rows/s':>10} {'rss MiB':>8}")
+        rows = []
+        for stage in self.stages:
+            print(f"{stage['stage']:<20} {stage['wall_seconds']:>8.2f} "
+                  f"{stage['cpu_seconds']:>8.2f} {stage['rows_parsed']:>10} "
+                  f"{stage['rows_written']:>10} {stage['rows_per_second']:>10.0f} "
+                  f"{stage['peak_rss_mb']:>8.1f}")
+            rows.append((self.started_at, stage['stage'], stage['wall_seconds'],
+                         stage['cpu_seconds'], stage['rows_parsed'],
+                         stage['rows_written'], stage['rows_per_second'],
+                         stage['peak_rss_mb']))
+            # Tables loaded together share the stage's time; only their rows
+            # are known
+            for table in stage.get('tables', []):
+                print(f"  {table['table']:<18} {'':>8} {'':>8} "
+                      f"{table['rows_parsed']:>10} {table['rows_written']:>10}")
+                rows.append((self.started_at, f"{stage['stage']}:{table['table']}",
+                             None, None, table['rows_parsed'], table['rows_written'],
+                             None, None))
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'database': DATABASE_NAME, 'started_at': self.started_at,
+                       'stages': self.stages}, f, indent=2)
+        conn.executemany('''
+            INSERT INTO import_runs (runStartedAt, stage, wallSeconds, cpuSeconds,
+                                     rowsParsed, rowsWritten, rowsPerSecond, peakRssMb)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+        print(f"Import profile saved to '{path}' and the import_runs table.")
+
+
+def _as_number(value):
+    """Returns value as an int/float if it is one (or a numeric string), or None."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return None
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Timestamp column used as the high-water mark of each table that has one.
+# On later runs, items at or before the newest imported timestamp are checked
+# against the stored rows instead of being inserted (see BulkLoader).
+WATERMARK_COLUMNS = {
+    'checkins': 'createdAt',
+    'photos': 'createdAt',
+    'visits': 'timeArrived',
+    'unconfirmed_visits': 'startTime',
+    'tips': 'createdAt',
+    'comments': 'time',
+    'plans': 'createdAt',
+    'shares': 'sharedAt',
+}
+
+
+class ImportManifest:
+    """
+    Remembers what earlier runs imported so a re-run only does new work:
+
+    - import_manifest holds size, mtime and SHA-256 (CRC-32 for zip members)
+      of every source file that was imported successfully. A file whose size
+      and mtime match is skipped without being read; if only the mtime
+      changed, the hash decides.
+    - import_watermarks holds the newest timestamp imported per table (see
+      WATERMARK_COLUMNS), handed to BulkLoader: items after it are new, items
+      at or before it are merged with the stored rows (or dropped, for tables
+      without MERGE_KEYS).
+    - import_state holds the last checkpoint (items and byte offset) of files
+      whose import has not finished. With resume=True those files continue
+      after it, if they have not changed since; otherwise the checkpoints of
+      an interrupted import are discarded.
+
+    With full=True every file is imported and every row is merged, but the
+    manifest is still updated.
+    """
+
+    def __init__(self, conn, export, full=False, resume=False):
+        self.conn = conn
+        self.export = export
+        self.full = full
+        self.files = {
+            path: (size, mtime, digest) for path, size, mtime, digest
+            in conn.execute('SELECT path, size, mtime, sha256 FROM import_manifest')}
+        # Watermarks are per user, so one account's newer export does not hide
+        # another's older items
+        self.user_key = export.user_id or ''
+        self.watermarks = dict(conn.execute(
+            'SELECT tableName, value FROM import_watermarks WHERE userId = ?',
+            (self.user_key,)))
+        self.pending = {}
+        self.checkpoints = {
+            path: (size, mtime, items, offset) for path, size, mtime, items, offset
+            in conn.execute('SELECT path, size, mtime, items, byteOffset '
+                            'FROM import_state')}
+        if self.checkpoints and not resume:
+            print("Discarding checkpoints of an interrupted import of "
+                  f"{len(self.checkpoints)} file(s); use --resume to continue it "
+                  "instead.")
+            conn.execute('DELETE FROM import_state')
+            conn.commit()
+            self.checkpoints = {}
+
+    def is_unchanged(self, filename):
+        """`filename` is a name from the ExportReader the manifest was made with."""
+        path = self.export.key(filename)
+        size, mtime, digest = self.export.stat(filename)
+        known = self.files.get(path)
+        if not self.full and known and known[:2] == (size, mtime):
+            return True
+        self.pending[path] = (size, mtime, digest())
+        if not self.full and known and known[2] == self.pending[path][2]:
+            # Same content, just touched: remember the new mtime
+            self.finish([filename])
+            return True
+        return False
+
+    def resume_point(self, filename):
+        """
+        Returns (items, byte offset) to continue an interrupted import of an
+        unchanged file after, or None.
+        """
+        checkpoint = self.checkpoints.get(self.export.key(filename))
+        if checkpoint is None or checkpoint[:2] != self.export.stat(filename)[:2]:
+            return None
+        return checkpoint[2:]
+
+    def checkpoint(self, filename, items, offset):
+        """
+        Records progress through a file; committed by the caller with the rows
+        it covers.
+        """
+        path = self.export.key(filename)
+        size, mtime, _ = self.pending[path]
+        self.conn.execute('''
+            INSERT OR REPLACE INTO import_state
+                (path, size, mtime, items, byteOffset, updatedAt)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (path, size, mtime, items, offset, int(time.time())))
+
+    def watermark(self, table):
+        column = WATERMARK_COLUMNS.get(table)
+        if column is None:
+            return None
+        return column, None if self.full else self.watermarks.get(table)
+
+    def finish(self, filenames, *loaders):
+        """
+        Records successfully imported files and the loaders' new high-water
+        marks.
+        """
+        for loader in loaders:
+            if loader.skipped:
+                print(f"Skipped {loader.skipped} {loader.table} rows at or before the "
+                      "previous import's high-water mark.")
+            previous = self.watermarks.get(loader.table)
+            if (loader.high_water is not None
+                    and (previous is None or loader.high_water > previous)):
+                self.watermarks[loader.table] = loader.high_water
+                self.conn.execute('''
+                    INSERT OR REPLACE INTO import_watermarks
+                        (tableName, columnName, value, userId)
+                    VALUES (?, ?, ?, ?)
+                ''', (loader.table, WATERMARK_COLUMNS[loader.table], loader.high_water,
+                      self.user_key))
+        for filename in filenames:
+            path = self.export.key(filename)
+            entry = self.pending.pop(path, None)
+            if entry is None:
+                continue
+            self.conn.execute('DELETE FROM import_state WHERE path = ?', (path,))
+            self.files[path] = entry
+            self.conn.execute('''
+                INSERT OR REPLACE INTO import_manifest
+                    (path, size, mtime, sha256, importedAt)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (path, *entry, int(time.time())))
+        self.conn.commit()
+
+
+# Key columns of the tables whose rows are merged with earlier imports (see
+# RowMerger), matching their primary keys. Comments have no id in the export,
+# so their content is their key.
+MERGE_KEYS = {
+    'checkins': ['id'],
+    'photos': ['id'],
+    'users': ['id'],
+    'friends': ['userId', 'friendId'],
+    'visits': ['id'],
+    'unconfirmed_visits': ['id'],
+    'tips': ['id'],
+    'comments': ['userId', 'time', 'comment'],
+    'venue_ratings': ['userId', 'id'],
+    'expertise': ['id'],
+    'plans': ['id'],
+    'shares': ['id'],
+}
+
+_UNKNOWN = object()
+
+
+class RowMerger:
+    """
+    Dedup/merge state of one table during an import: a dict from the key of
+    every row seen to a fingerprint (hash) of its `merged` columns, the ones
+    the export provides. It is filled from the table the first time a row is
+    checked, so imports that only append never read the table back.
+
+    classify(row, rank) says what to do with a row: 'new' (insert it),
+    'identical' (drop it before it reaches SQLite), 'updated' (write it with
+    upsert_sql, which only sets the merged columns) or 'superseded'. When
+    several exports of one account are imported together (shared=True), the
+    version from the export with the highest rank wins whatever order their
+    files are parsed in; otherwise the version imported last does.
+    """
+
+    def __init__(self, conn, table, columns, merged, shared=False):
+        self.conn = conn
+        self.table = table
+        self.merged = merged
+        keys = MERGE_KEYS[table]
+        key_index = [columns.index(column) for column in keys]
+        self.key = itemgetter(*key_index) # A single key column gives the bare value
+        # Photos carry a localPath the export does not provide; fingerprint the
+        # rest
+        self.values = (None if merged == columns
+                       else itemgetter(*[columns.index(column) for column in merged]))
+        updates = ', '.join(f"{column} = excluded.{column}"
+                            for column in merged if column not in keys)
+        self.upsert_sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                           f"VALUES ({', '.join('?' * len(columns))})")
+        # Otherwise every column is part of the key and a known row is always
+        # identical
+        if updates:
+            self.upsert_sql += (f" ON CONFLICT({', '.join(keys)}) "
+                                f"DO UPDATE SET {updates}")
+        self.fingerprints = None
+        self.ranks = {} if shared else None
+
+    def fingerprint(self, row):
+        try:
+            return hash(row if self.values is None else self.values(row))
+        except TypeError: # A list or object instead of a value; SQLite reports it
+            return None
+
+    def load(self):
+        key = self.key
+        self.fingerprints = {}
+        rows = self.conn.execute(f"SELECT {', '.join(self.merged)} FROM {self.table}")
+        for row in rows:
+            self.fingerprints[key(row)] = hash(row)
+
+    def classify(self, row, rank=0):
+        if self.fingerprints is None:
+            self.load()
+        key = self.key(row)
+        if self.ranks is not None:
+            if self.ranks.get(key, rank) > rank:
+                return 'superseded'
+            self.ranks[key] = rank
+        fingerprint = self.fingerprint(row)
+        known = self.fingerprints.get(key, _UNKNOWN)
+        self.fingerprints[key] = fingerprint
+        if known is _UNKNOWN:
+            return 'new'
+        if fingerprint is not None and fingerprint == known:
+            return 'identical'
+        return 'updated'
+
+
+# Current schema, one CREATE TABLE per table. Timestamps are stored as INTEGER
+# Unix seconds and coordinates as REAL so they compare and index numerically.
+# Databases created with an older layout are upgraded by migrate_schema().
+# Several exports can share one database: rows of per-user data carry the
+# userId of the export they came from (see USER_TABLES); venues are shared.
+TABLE_SCHEMAS = {
+    'checkins': '''
         CREATE TABLE IF NOT EXISTS checkins (
             id TEXT PRIMARY KEY,
-            createdAt TEXT,
+            createdAt INTEGER,
             venueId TEXT,
             shout TEXT,
             timeZone TEXT,
-            FOREIGN KEY (venueId) REFERENCES venues(id)
+            userId TEXT,
+            FOREIGN KEY (venueId) REFERENCES venues(id),
+            FOREIGN KEY (userId) REFERENCES users(id)
         )
-    ''')
-
-    # Create photos table
-    cursor.execute('''
+    ''',
+    'photos': '''
         CREATE TABLE IF NOT EXISTS photos (
             id TEXT PRIMARY KEY,
             checkinId TEXT,
-            createdAt TEXT,
+            createdAt INTEGER,
             fullUrl TEXT,
             localPath TEXT,
             width INTEGER,
             height INTEGER,
-            FOREIGN KEY (checkinId) REFERENCES checkins(id)
+            userId TEXT,
+            fileSize INTEGER,
+            fileExt TEXT,
+            FOREIGN KEY (checkinId) REFERENCES checkins(id),
+            FOREIGN KEY (userId) REFERENCES users(id)
         )
-    ''')
-
-    # Create users table
-    cursor.execute('''
+    ''',
+    'users': '''
         CREATE TABLE IF NOT EXISTS users (
             id TEXT PRIMARY KEY,
             firstName TEXT,
@@ -58,10 +1033,8 @@ def setup_database():
             tipsCount INTEGER,
             listsCount INTEGER
         )
-    ''')
-
-    # Create friends table
-    cursor.execute('''
+    ''',
+    'friends': '''
         CREATE TABLE IF NOT EXISTS friends (
             userId TEXT,
             friendId TEXT,
@@ -71,15 +1044,13 @@ def setup_database():
             PRIMARY KEY (userId, friendId),
             FOREIGN KEY (userId) REFERENCES users(id)
         )
-    ''')
-
-    # Create visits table
-    cursor.execute('''
+    ''',
+    'visits': '''
         CREATE TABLE IF NOT EXISTS visits (
             id TEXT PRIMARY KEY,
             userId TEXT,
-            timeArrived TEXT,
-            timeDeparted TEXT,
+            timeArrived INTEGER,
+            timeDeparted INTEGER,
             os TEXT,
             osVersion TEXT,
             deviceModel TEXT,
@@ -92,26 +1063,24 @@ def setup_database():
             locationType TEXT,
             FOREIGN KEY (userId) REFERENCES users(id)
         )
-    ''')
-
-    # Create unconfirmed_visits table
-    cursor.execute('''
+    ''',
+    'unconfirmed_visits': '''
         CREATE TABLE IF NOT EXISTS unconfirmed_visits (
             id TEXT PRIMARY KEY,
-            startTime TEXT,
-            endTime TEXT,
+            startTime INTEGER,
+            endTime INTEGER,
             venueId TEXT,
             lat REAL,
             lng REAL,
-            FOREIGN KEY (venueId) REFERENCES venues(id)
+            userId TEXT,
+            FOREIGN KEY (venueId) REFERENCES venues(id),
+            FOREIGN KEY (userId) REFERENCES users(id)
         )
-    ''')
-
-    # Create tips table
-    cursor.execute('''
+    ''',
+    'tips': '''
         CREATE TABLE IF NOT EXISTS tips (
             id TEXT PRIMARY KEY,
-            createdAt TEXT,
+            createdAt INTEGER,
             text TEXT,
             type TEXT,
             canonicalUrl TEXT,
@@ -123,63 +1092,55 @@ def setup_database():
             FOREIGN KEY (userId) REFERENCES users(id),
             FOREIGN KEY (venueId) REFERENCES venues(id)
         )
-    ''')
-
-    # Create comments table
-    cursor.execute('''
+    ''',
+    'comments': '''
         CREATE TABLE IF NOT EXISTS comments (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             userId TEXT,
-            time TEXT,
+            time INTEGER,
             comment TEXT,
             FOREIGN KEY (userId) REFERENCES users(id)
         )
-    ''')
-
-    # Create venue_ratings table
-    cursor.execute('''
+    ''',
+    'venue_ratings': '''
         CREATE TABLE IF NOT EXISTS venue_ratings (
-            id TEXT PRIMARY KEY,
+            id TEXT,
             name TEXT,
-            url TEXT
+            url TEXT,
+            userId TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (userId, id)
         )
-    ''')
-
-    # Create expertise table
-    cursor.execute('''
+    ''',
+    'expertise': '''
         CREATE TABLE IF NOT EXISTS expertise (
             id TEXT PRIMARY KEY,
             type TEXT,
-            timestamp TEXT,
-            lastModified TEXT
+            timestamp INTEGER,
+            lastModified INTEGER,
+            userId TEXT
         )
-    ''')
-
-    # Create plans table
-    cursor.execute('''
+    ''',
+    'plans': '''
         CREATE TABLE IF NOT EXISTS plans (
             id TEXT PRIMARY KEY,
             userId TEXT,
-            createdAt TEXT,
-            modifiedTime TEXT,
+            createdAt INTEGER,
+            modifiedTime INTEGER,
             isBroadcast BOOLEAN,
             type TEXT,
             FOREIGN KEY (userId) REFERENCES users(id)
         )
-    ''')
-
-    # Create shares table
-    cursor.execute('''
+    ''',
+    'shares': '''
         CREATE TABLE IF NOT EXISTS shares (
             id TEXT PRIMARY KEY,
-            sharedAt TEXT,
+            sharedAt INTEGER,
             state TEXT,
-            type TEXT
+            type TEXT,
+            userId TEXT
         )
-    ''')
-
-    # Create venues table
-    cursor.execute('''
+    ''',
+    'venues': '''
         CREATE TABLE IF NOT EXISTS venues (
             id TEXT PRIMARY KEY,
             name TEXT,
@@ -188,1479 +1149,1371 @@ def setup_database():
             lng REAL,
             url TEXT
         )
-    ''')
-
-    conn.commit()
-    conn.close()
-    print(f"Database '{DATABASE_NAME}' and tables 'checkins', 'photos', 'users', 'friends', 'visits', 'unconfirmed_visits', 'tips', 'comments', 'venue_ratings', 'expertise', 'plans', 'shares', 'venues' set up successfully.")
-
-
-def import_venues_data():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
-    total_venues_processed = 0
-
-    # Process checkins for venue data
-    checkin_files = [f for f in os.listdir('.') if f.startswith('checkins') and f.endswith('.json')]
-    print(f"DEBUG: Processing checkin files for venues: {checkin_files}")
-    for filename in checkin_files:
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for item in data.get('items', []):
-                venue = item.get('venue', {})
-                venue_id = venue.get('id')
-                venue_name = venue.get('name')
-                location = venue.get('location', {})
-
-                
-                venue_address_from_location = location.get('address')
-                venue_formatted_address_list = location.get('formattedAddress', [])
-                
-                # Prioritize 'address' field, but if not available, use 'formattedAddress'
-                if venue_address_from_location:
-                    venue_address = venue_address_from_location
-                elif venue_formatted_address_list:
-                    venue_address = ", ".join(venue_formatted_address_list)
-                else:
-                    venue_address = None
-                
-                venue_lat = item.get('lat') # Corrected extraction
-                venue_lng = item.get('lng') # Corrected extraction
-                
-                if venue_id:
-
+    ''',
+    # VENUE_SOURCE_PRIORITY of the source each venue field was taken from (0:
+    # none yet), so later imports know which stored fields they may replace.
+    'venue_sources': '''
+        CREATE TABLE IF NOT EXISTS venue_sources (
+            id TEXT PRIMARY KEY,
+            name INTEGER,
+            address INTEGER,
+            lat INTEGER,
+            lng INTEGER,
+            url INTEGER,
+            FOREIGN KEY (id) REFERENCES venues(id)
+        )
+    ''',
+    # Display-size copies of photo files, written by make_thumbnails.py. One
+    # row per photo and size; path is relative to the database's directory.
+    'photo_thumbnails': '''
+        CREATE TABLE IF NOT EXISTS photo_thumbnails (
+            photoId TEXT,
+            size INTEGER,
+            path TEXT,
+            width INTEGER,
+            height INTEGER,
+            contentHash TEXT,
+            sourceSize INTEGER,
+            PRIMARY KEY (photoId, size),
+            FOREIGN KEY (photoId) REFERENCES photos(id)
+        )
+    ''',
+    # Grid clusters of the geolocated check-ins per map tile (see
+    # build_map_clusters); userId '' holds the clusters of all accounts together.
+    'map_clusters': '''
+        CREATE TABLE IF NOT EXISTS map_clusters (
+            userId TEXT NOT NULL,
+            zoom INTEGER NOT NULL,
+            tileX INTEGER NOT NULL,
+            tileY INTEGER NOT NULL,
+            cellX INTEGER NOT NULL,
+            cellY INTEGER NOT NULL,
+            count INTEGER,
+            venues INTEGER,
+            lat REAL,
+            lng REAL,
+            venueName TEXT,
+            firstAt INTEGER,
+            lastAt INTEGER,
+            PRIMARY KEY (userId, zoom, tileX, tileY, cellX, cellY)
+        )
+    ''',
+    # Bookkeeping for incremental imports (see ImportManifest)
+    'import_manifest': '''
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            sha256 TEXT,
+            importedAt INTEGER
+        )
+    ''',
+    'import_watermarks': '''
+        CREATE TABLE IF NOT EXISTS import_watermarks (
+            tableName TEXT,
+            columnName TEXT,
+            value INTEGER,
+            userId TEXT NOT NULL DEFAULT '',
+            PRIMARY KEY (tableName, userId)
+        )
+    ''',
+    'import_state': '''
+        CREATE TABLE IF NOT EXISTS import_state (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            items INTEGER,
+            byteOffset INTEGER,
+            updatedAt INTEGER
+        )
+    ''',
+    # One row per stage of every --profile run (see ImportProfiler), plus a
+    # '<stage>:<table>' row with the row counts of each table of a stage that
+    # loads several
+    'import_runs': '''
+        CREATE TABLE IF NOT EXISTS import_runs (
+            runStartedAt INTEGER,
+            stage TEXT,
+            wallSeconds REAL,
+            cpuSeconds REAL,
+            rowsParsed INTEGER,
+            rowsWritten INTEGER,
+            rowsPerSecond REAL,
+            peakRssMb REAL
+        )
+    ''',
+    # Arrow snapshots written after the import (see snapshots.py)
+    'import_snapshots': '''
+        CREATE TABLE IF NOT EXISTS import_snapshots (
+            name TEXT PRIMARY KEY,
+            path TEXT,
+            rows INTEGER,
+            token TEXT
+        )
+    ''',
+}
 
-                    cursor.execute('''
-                        UPDATE venues SET 
-                            name = COALESCE(?, name),
-                            address = COALESCE(address, ?),
-                            lat = COALESCE(lat, ?),
-                            lng = COALESCE(lng, ?)
-                        WHERE id = ?
-                    ''', (venue_name, venue_address, venue_lat, venue_lng, venue_id))
-                    
 
-    
+def _declared_columns(conn, table):
+    return [(name, declared_type.upper(), pk) for _, name, declared_type, _, _, pk
+            in conn.execute(f"PRAGMA table_info({table})")]
 
 
-    # Process unconfirmed_visits for venue data
+def _expected_columns(table):
+    scratch = sqlite3.connect(':memory:')
     try:
-        with open('unconfirmed_visits.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            print("DEBUG: Processing unconfirmed_visits.json for venues.")
-            for item in data.get('items', []):
-                venue_id = item.get('venueId')
-                venue = item.get('venue', {})
-                venue_name = venue.get('name')
-                venue_url = venue.get('url')
-                lat = item.get('lat')
-                lng = item.get('lng')
+        scratch.execute(TABLE_SCHEMAS[table])
+        return _declared_columns(scratch, table)
+    finally:
+        scratch.close()
+
+
+def migrate_schema(conn):
+    """
+    Brings tables created by older versions of this script up to TABLE_SCHEMAS.
+
+    Tables that only lack trailing columns get them with ALTER TABLE ADD COLUMN.
+    Tables whose column types or primary key changed (e.g. TEXT timestamps from
+    before the typed schema) are rebuilt: the rows are copied into a table
+    created from the current definition, where INTEGER/REAL affinity converts
+    numeric strings to native numbers, and the new table replaces the old one.
+
+    Returns the names of the tables that were changed.
+    """
+    migrated = []
+    for table in TABLE_SCHEMAS:
+        current = _declared_columns(conn, table)
+        expected = _expected_columns(table)
+        if current == expected:
+            continue
+
+        migrated.append(table)
+        added = expected[len(current):]
+        if current == expected[:len(current)] and not any(pk for _, _, pk in added):
+            for name, declared_type, _ in added:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declared_type}")
+            print(f"Migrated table '{table}': added columns "
+                  f"{', '.join(name for name, _, _ in added)}.")
+            continue
+
+        current_names = {name for name, _, _ in current}
+        shared = ', '.join(name for name, _, _ in expected if name in current_names)
+        conn.execute(f"DROP TABLE IF EXISTS _{table}_new")
+        conn.execute(TABLE_SCHEMAS[table].replace(
+            f"CREATE TABLE IF NOT EXISTS {table} (", f"CREATE TABLE _{table}_new (", 1))
+        conn.execute(f"INSERT INTO _{table}_new ({shared}) "
+                     f"SELECT {shared} FROM {table}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE _{table}_new RENAME TO {table}")
+        print(f"Migrated table '{table}' to the current column types and keys.")
+    conn.commit()
+    return migrated
+
+
+# Tables with a userId column filled from the export the row came from.
+USER_TABLES = ['checkins', 'photos', 'unconfirmed_visits', 'venue_ratings', 'expertise',
+               'shares']
+
+
+def backfill_user_ids(conn, tables):
+    """
+    Gives rows imported before USER_TABLES had a userId the id of the
+    database's only user, as does the import watermark. With several users
+    the owner of such rows is unknown, and they are left as they are.
+    """
+    users = [user_id for (user_id,) in conn.execute('SELECT id FROM users LIMIT 2')]
+    if len(users) != 1:
+        return
+    for table in tables:
+        if table in USER_TABLES:
+            updated = conn.execute(f"UPDATE {table} SET userId = ? "
+                                   "WHERE userId IS NULL OR userId = ''",
+                                   users).rowcount
+            if updated:
+                print(f"Assigned {updated} existing {table} rows to user {users[0]}.")
+    if 'import_watermarks' in tables:
+        conn.execute("UPDATE import_watermarks SET userId = ? WHERE userId = ''", users)
+    conn.commit()
 
 
-    except FileNotFoundError:
-        print("unconfirmed_visits.json not found. Skipping.")
-    except Exception as e:
-        print(f"Error processing unconfirmed_visits.json for venues: {e}")
+def setup_database(conn):
+    for ddl in TABLE_SCHEMAS.values():
+        conn.execute(ddl)
+    backfill_user_ids(conn, migrate_schema(conn))
 
-    # Process tips for venue data
-    try:
-        with open('tips.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            print("DEBUG: Processing tips.json for venues.")
-            for item in data.get('items', []):
-                venue = item.get('venue', {})
-                venue_id = venue.get('id')
-                venue_name = venue.get('name')
+    conn.commit()
+    print(f"Database '{DATABASE_NAME}' and tables 'checkins', 'photos', 'users', 'friends', 'visits', 'unconfirmed_visits', 'tips', 'comments', 'venue_ratings', 'expertise', 'plans', 'shares', 'venues' set up successfully.")
 
 
-    except FileNotFoundError:
-        print("tips.json not found. Skipping.")
-    except Exception as e:
-        print(f"Error processing tips.json for venues: {e}")
-    
-    # Process venueRatings for venue data
+# Secondary indexes for the queries run by backend/main.py, visualize.py and
+# verify_data.py. They are created by build_indexes() once the bulk load is
+# done, which is cheaper than maintaining them row by row during the load.
+INDEXES = {
+    # /api/checkins/geo and the weekly timeline: ordered scan by time that also
+    # carries the join key and display fields, so the checkins table is not
+    # touched
+    'idx_checkins_createdAt': 'checkins (createdAt, id, venueId, shout)',
+    # Joins from venues and count(DISTINCT venueId) in /api/stats
+    'idx_checkins_venueId': 'checkins (venueId)',
+    # GROUP BY city for the top city in /api/stats and visualize.plot_top_cities
+    'idx_visits_city': 'visits (city)',
+    # photos -> checkins link check in verify_data.py
+    'idx_photos_checkinId': 'photos (checkinId)',
+    # Venue lookup in the geo join, answered from the index alone
+    'idx_venues_geo': 'venues (id, lat, lng, name)',
+    # The same per user (?user_id= in the backend), so one account's queries
+    # do not slow down as more exports are added
+    'idx_checkins_userId_createdAt': 'checkins (userId, createdAt, id, venueId, shout)',
+    'idx_visits_userId_city': 'visits (userId, city)',
+}
+
+
+def build_indexes(conn):
+    """Creates any missing INDEXES and refreshes the planner statistics."""
+    existing = {name for (name,)
+                in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    created = [name for name in INDEXES if name not in existing]
+    for name, definition in INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    # Sample at most ~1000 rows per index so ANALYZE stays fast on large tables
+    conn.execute("PRAGMA analysis_limit = 1000")
+    conn.execute("ANALYZE")
+    conn.commit()
+    print(f"Indexes ready ({len(created)} created, "
+          f"{len(INDEXES) - len(created)} already present). "
+          "Planner statistics updated.")
+
+
+# Map clusters are built for zoom levels 0 to CLUSTER_MAX_ZOOM, in cells of
+# 256 >> CLUSTER_CELL_SHIFT pixels: 4 x 4 cells per 256-pixel tile.
+CLUSTER_MAX_ZOOM = 16
+CLUSTER_CELL_SHIFT = 2
+MERCATOR_MAX_LATITUDE = 85.05112878
+
+
+def mercator(lat, lng):
+    """
+    Web Mercator position of a point as fractions (x, y) of the world's width,
+    from the top left.
+    """
+    lat = max(-MERCATOR_MAX_LATITUDE, min(MERCATOR_MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    return ((lng + 180) / 360 % 1.0,
+            0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi))
+
+
+def build_map_clusters(conn, changed=True):
+    """
+    Rebuilds map_clusters, the check-ins counted per grid cell at every zoom
+    level, so /api/tiles serves a tile from a handful of rows whatever the
+    size of the history. Each cell keeps its check-in and venue counts, the
+    centroid of its check-ins, the venue name when it holds a single venue,
+    and its first and last check-in time.
+
+    The grid starts from one entry per account and venue at CLUSTER_MAX_ZOOM;
+    each coarser level merges 2 x 2 cells of the level below, so the work
+    grows with the number of venues, not of check-ins. Skipped when the
+    import changed nothing and the clusters exist.
+    """
+    if not changed and conn.execute('SELECT 1 FROM map_clusters LIMIT 1').fetchone():
+        print("Map clusters are up to date.")
+        return
+    cells = 1 << (CLUSTER_MAX_ZOOM + CLUSTER_CELL_SHIFT)
+    level = {}
+    venues = {} # (cellX, cellY, venue id) -> entry over all accounts
+    venue_counts = conn.execute('''
+        SELECT c.userId, v.id, v.name, v.lat, v.lng, count(*), min(c.createdAt),
+               max(c.createdAt)
+        FROM checkins c
+        JOIN venues v ON c.venueId = v.id
+        WHERE v.lat IS NOT NULL AND v.lng IS NOT NULL
+          AND typeof(c.createdAt) = 'integer'
+        GROUP BY c.userId, v.id
+    ''')
+    for user_id, venue_id, name, lat, lng, count, first_at, last_at in venue_counts:
+        x, y = mercator(lat, lng)
+        cell = (min(int(x * cells), cells - 1), min(int(y * cells), cells - 1))
+        entry = [count, lat * count, lng * count, 1, name, first_at, last_at]
+        if user_id:
+            _merge_cluster(level, (user_id, *cell), entry)
+        # A venue visited from several accounts is still one venue for all of
+        # them
+        _merge_cluster(venues, (*cell, venue_id), entry, same_venue=True)
+    for (x, y, _), entry in venues.items():
+        _merge_cluster(level, ('', x, y), entry)
+
+    conn.execute('DELETE FROM map_clusters')
+    rows = 0
+    for zoom in range(CLUSTER_MAX_ZOOM, -1, -1):
+        conn.executemany('''
+            INSERT INTO map_clusters (userId, zoom, tileX, tileY, cellX, cellY, count,
+                                      venues, lat, lng, venueName, firstAt, lastAt)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(user_id, zoom, x >> CLUSTER_CELL_SHIFT, y >> CLUSTER_CELL_SHIFT, x, y,
+               count, venue_count, lat_sum / count, lng_sum / count, name, first_at,
+               last_at)
+              for (user_id, x, y), (count, lat_sum, lng_sum, venue_count, name,
+                                    first_at, last_at) in level.items()])
+        rows += len(level)
+        parent = {}
+        for (user_id, x, y), entry in level.items():
+            _merge_cluster(parent, (user_id, x >> 1, y >> 1), entry)
+        level = parent
+    conn.commit()
+    print(f"Built {rows} map clusters for zoom levels 0-{CLUSTER_MAX_ZOOM}.")
+
+
+def _merge_cluster(cells, key, entry, same_venue=False):
+    """
+    Adds a [count, lat sum, lng sum, venues, venue name, first, last] entry
+    into cells[key].
+    """
+    target = cells.get(key)
+    if target is None:
+        cells[key] = list(entry)
+        return
+    target[0] += entry[0]
+    target[1] += entry[1]
+    target[2] += entry[2]
+    if not same_venue:
+        target[3] += entry[3]
+        target[4] = None # The name is only kept for a single venue
+    target[5] = min(target[5], entry[5])
+    target[6] = max(target[6], entry[6])
+
+
+def export_snapshots(conn, directory, changed=True):
+    """
+    Writes the Arrow snapshots of snapshots.SNAPSHOTS into directory, unless
+    the import changed nothing and the existing ones are still current. When
+    they cannot be written (no directory, pyarrow missing) the records of
+    older snapshots are dropped, so readers fall back to SQLite.
+    """
+    if not changed and all(snapshots.load_snapshot(conn, name) is not None
+                           for name in snapshots.SNAPSHOTS):
+        print("Snapshots are up to date.")
+        return
+    if directory is None or snapshots.pa is None:
+        if conn.execute('DELETE FROM import_snapshots').rowcount:
+            conn.commit()
+            print("Existing snapshots are out of date and will no longer be used.")
+        if directory is not None:
+            print("pyarrow is not installed. Skipping the Arrow snapshots.")
+        return
+    snapshots.write_snapshots(conn, directory, DATABASE_NAME)
+
+
+# Venue fields are merged field by field across every export file that mentions
+# a venue. A non-empty value from a higher-priority source replaces one from a
+# lower-priority source. Within one source, the value from the export given
+# last wins when several exports of an account are imported together, and the
+# first value seen otherwise. The priority of every stored field is kept in
+# venue_sources, so this also holds across incremental imports that skip the
+# files of some sources.
+VENUE_SOURCE_PRIORITY = {
+    'checkins': 4, # Full venue object including location
+    'unconfirmed_visits': 3, # Name, url and the detected visit coordinates
+    'venueRatings': 2, # Name and url of liked venues
+    'tips': 1, # Name only
+}
+VENUE_COLUMNS = ['id', 'name', 'address', 'lat', 'lng', 'url']
+
+
+class VenueAccumulator:
+    """
+    Collects venue rows from all sources in memory, keyed by venue id, and
+    writes each venue once at the end with a bulk INSERT ... ON CONFLICT DO
+    UPDATE (and at import checkpoints, see write_venues).
+
+    Rows are (source, id, name, address, lat, lng, url) tuples, where source
+    is a key of VENUE_SOURCE_PRIORITY. `rank` orders the exports of one run,
+    as for RowMerger: at the same source priority, a value from a
+    higher-ranked export replaces one from a lower-ranked export.
+    """
+
+    def __init__(self):
+        # id -> [values, ranks, last row], values/ranks indexed like
+        # VENUE_COLUMNS[1:]
+        self.venues = {}
+        self.unwritten = {} # Ids changed since the last write_venues(), in order
+        # id -> (values, priorities) in the database, loaded by the first
+        # write_venues()
+        self.stored = None
+        self.unchanged = 0
+        self.written = set() # Ids written by write_venues(), checkpoints included
+
+    def add(self, row, rank=0):
+        venue_id = row[1]
+        if not venue_id:
+            return
+        entry = self.venues.get(venue_id)
+        if entry is not None and entry[2] == row:
+            return # Most check-ins repeat the venue object of an earlier one
+        source, _, *values = row
+        rank = (VENUE_SOURCE_PRIORITY[source], rank)
+        if entry is None:
+            ranks = [rank if value is not None else (0, 0) for value in values]
+            self.venues[venue_id] = [values, ranks, row]
+            self.unwritten[venue_id] = None
+            return
+        merged, ranks, _ = entry
+        entry[2] = row
+        for i, value in enumerate(values):
+            if value is not None and rank > ranks[i]:
+                merged[i] = value
+                ranks[i] = rank
+                self.unwritten[venue_id] = None
+
+    def rows(self):
+        for venue_id, (values, _, _) in self.venues.items():
+            yield (venue_id, *values)
+
+    def __len__(self):
+        return len(self.venues)
+
+
+class _ExportVenues:
+    """Adds the venue rows of one export to a VenueAccumulator at its rank."""
+
+    def __init__(self, venues, rank):
+        self.venues = venues
+        self.rank = rank
+
+    def add(self, row):
+        self.venues.add(row, self.rank)
+
+
+def _load_stored_venues(conn):
+    """
+    Returns {id: (values, priorities)} of the stored venues, both indexed like
+    VENUE_COLUMNS[1:].
+    """
+    fields = VENUE_COLUMNS[1:]
+    stored = {}
+    for row in conn.execute(f'''
+        SELECT v.id, {', '.join(f'v.{column}' for column in fields)},
+               s.id, {', '.join(f's.{column}' for column in fields)}
+        FROM venues v
+        LEFT JOIN venue_sources s ON s.id = v.id
+    '''):
+        values = row[1:len(VENUE_COLUMNS)]
+        if row[len(VENUE_COLUMNS)] is None:
+            # Imported before field sources were recorded: rank it like check-in
+            # data
+            top = max(VENUE_SOURCE_PRIORITY.values())
+            ranks = tuple(top if value is not None else 0 for value in values)
+        else:
+            ranks = row[len(VENUE_COLUMNS) + 1:]
+        stored[row[0]] = (values, ranks)
+    return stored
+
+
+def write_venues(conn, venues):
+    """
+    Upserts the venues of `venues` that changed since the last call and adds
+    their ids to venues.written. Venues stay in memory, so later sources still
+    merge into them; a venue changed again is simply written again.
+
+    A stored field is only replaced by a value from a source of equal or
+    higher priority than the one it came from (see venue_sources), so e.g. a
+    changed tips.json imported on its own does not overwrite the name an
+    earlier run took from a check-in. Venues that would be left as they are
+    are skipped and counted in venues.unchanged instead.
+    """
+    if venues.stored is None:
+        venues.stored = _load_stored_venues(conn)
+    columns = ', '.join(VENUE_COLUMNS)
+    placeholders = ', '.join('?' * len(VENUE_COLUMNS))
+    updates = ', '.join(f"{column} = excluded.{column}" for column in VENUE_COLUMNS[1:])
+    sources = []
+    # Not profiled: checkpoints write venues during the parse stages, and the
+    # venues stage reports them all (see import_venues_data)
+    with BulkLoader(conn, 'venues', label='venue', profiled=False, sql=f'''
+        INSERT INTO venues ({columns}) VALUES ({placeholders})
+        ON CONFLICT(id) DO UPDATE SET {updates}
+    ''') as loader:
+        for venue_id in venues.unwritten:
+            values, ranks, _ = venues.venues[venue_id]
+            # Export ranks only order the exports of this run
+            ranks = [priority for priority, _ in ranks]
+            stored = venues.stored.get(venue_id)
+            if stored is not None:
+                fields = [(value, rank) if value is not None and rank >= stored_rank
+                          else (stored_value, stored_rank)
+                          for value, rank, stored_value, stored_rank
+                          in zip(values, ranks, *stored)]
+                values, ranks = (tuple(column) for column in zip(*fields))
+                if (values, ranks) == stored:
+                    venues.unchanged += 1
+                    continue
+            venues.stored[venue_id] = (tuple(values), tuple(ranks))
+            loader.add((venue_id, *values))
+            sources.append((venue_id, *ranks))
+            venues.written.add(venue_id)
+        loader.flush()
+        # Committed together with the venues when the loader closes
+        conn.executemany(f"INSERT OR REPLACE INTO venue_sources ({columns}) "
+                         f"VALUES ({placeholders})", sources)
+    venues.unwritten.clear()
+
+
+def import_venues_data(conn, venues):
+    """
+    Writes the venues collected by the other importers that earlier checkpoints
+    have not written yet, one row per venue, and reports all written this run.
+    """
+    write_venues(conn, venues)
+    written = len(venues.written)
+    if _profiled_loaders is not None:
+        _profiled_loaders.append(_StageRows('venues', len(venues), written, 0))
+    print("Finished importing venues data. Total unique venues inserted/updated: "
+          f"{written}"
+          + (f" ({venues.unchanged} unchanged skipped)" if venues.unchanged else ""))
+
+
+def pix_directory(export):
+    """
+    Where the photo files of an export are: its pix/ folder, or pix/ next to
+    the database for a zip export.
+    """
+    if export.zip is None:
+        return os.path.join(export.path, PIX_DIR)
+    return PIX_DIR
+
+
+def index_pix(directory):
+    """
+    Lists a pix directory once with os.scandir and returns
+    {photo id: (file name, extension, size)} for the files in it, which are
+    named <photo id>.<extension>. Returns None if the directory does not exist.
+    """
+    files = {}
     try:
-        with open('venueRatings.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            print("DEBUG: Processing venueRatings.json for venues.")
-            for item in data.get('venueLikes', []):
-                venue_id = item.get('id')
-                venue_name = item.get('name')
-                venue_url = item.get('url')
-
-
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    photo_id, ext = os.path.splitext(entry.name)
+                    files.setdefault(photo_id, (entry.name, ext[1:].lower(),
+                                                entry.stat().st_size))
     except FileNotFoundError:
-        print("venueRatings.json not found. Skipping.")
-    except Exception as e:
-        print(f"Error processing venueRatings.json for venues: {e}")
-
+        return None
+    return files
+
+
+def link_photos(conn, exports):
+    """
+    Records which photos have a local file, with its path, size and actual
+    extension, and reports how many photos link to a known check-in. Each
+    export's pix directory is indexed once into a temporary table; photos are
+    then updated with set-based joins, only where their file changed, so photo
+    queries never have to look at the filesystem. Returns the number of photos
+    updated.
+    """
+    base = os.path.dirname(os.path.abspath(DATABASE_NAME))
+    conn.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS pix_files
+            (id TEXT PRIMARY KEY, localPath TEXT, fileExt TEXT, fileSize INTEGER)
+    ''')
+    indexed = changed = 0
+    for export in exports:
+        directory = pix_directory(export)
+        files = index_pix(directory)
+        if files is None:
+            print(f"No {directory} directory for export '{export.path}'. "
+                  "Its photos are recorded without local files.")
+            files = {}
+        indexed += len(files)
+        conn.execute('DELETE FROM pix_files')
+        root = os.path.abspath(directory)
+        conn.executemany('INSERT INTO pix_files VALUES (?, ?, ?, ?)',
+                         ((photo_id, os.path.relpath(os.path.join(root, name), base),
+                           ext, size)
+                          for photo_id, (name, ext, size) in files.items()))
+        # Photos of other accounts are left alone; their pix directories are not
+        # part of this run
+        changed += conn.execute('''
+            UPDATE photos
+            SET localPath = f.localPath, fileExt = f.fileExt, fileSize = f.fileSize
+            FROM pix_files f
+            WHERE photos.id = f.id AND photos.userId IS ?
+              AND (photos.localPath IS NOT f.localPath
+                   OR photos.fileExt IS NOT f.fileExt
+                   OR photos.fileSize IS NOT f.fileSize)
+        ''', (export.user_id,)).rowcount
+        changed += conn.execute('''
+            UPDATE photos SET localPath = NULL, fileExt = NULL, fileSize = NULL
+            WHERE userId IS ? AND localPath IS NOT NULL
+              AND id NOT IN (SELECT id FROM pix_files)
+        ''', (export.user_id,)).rowcount
+    conn.execute('DROP TABLE temp.pix_files')
     conn.commit()
-    conn.close()
-    print(f"Finished importing venues data. Total unique venues inserted/updated: {total_venues_processed}")
-
-
-def import_checkins_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    checkin_files = [f for f in os.listdir('.') if f.startswith('checkins') and f.endswith('.json')]
-
-
-    
-
-
-    total_checkins_imported = 0
-
-
-
-
-
-    for filename in checkin_files:
-
-
-        print(f"Processing checkins file: {filename}")
-
-
-        with open(filename, 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            for item in data.get('items', []):
-
-
-                checkin_id = item.get('id')
-
-
-                created_at = item.get('createdAt')
-
-
-                shout = item.get('shout')
-
-
-                time_zone = item.get('timeZone')
-
-
-
-
-
-                venue = item.get('venue', {})
-
-
-                venue_id = venue.get('id')
-
-
-                # No longer need venueName, venueAddress, venueLat, venueLng directly in checkins table
-
-
 
+    photos, with_file, linked, unlinked = conn.execute('''
+        SELECT count(*), count(p.localPath), count(c.id),
+               count(p.checkinId) - count(c.id)
+        FROM photos p
+        LEFT JOIN checkins c ON c.id = p.checkinId
+    ''').fetchone()
+    print(f"Indexed {indexed} photo files; {with_file} of {photos} photos have a local "
+          f"file ({changed} updated). {linked} photos link to an imported check-in, "
+          f"{unlinked} to a check-in that is not in the database.")
+    return changed
+
+
+def _path_getter(path):
+    """Returns a function reading `path` (a key, dotted path or None) from an item."""
+    if path is None:
+        return lambda item: None
+    if callable(path):
+        return path
+    keys = path.split('.')
+    if len(keys) == 1:
+        return lambda item: item.get(path)
+
+    def get(item):
+        for key in keys:
+            if not isinstance(item, dict):
+                return None
+            item = item.get(key)
+        return item
+    return get
+
+
+def _row_builder(paths):
+    """Compiles a list of paths into one function turning an item into a row tuple."""
+    if all(isinstance(path, str) and '.' not in path for path in paths):
+        keys = tuple(paths)
+        return lambda item: tuple(map(item.get, keys)) # Flat items: one C-level pass
+    getters = [_path_getter(path) for path in paths]
+    return lambda item: tuple([get(item) for get in getters])
+
+
+class TableMapping:
+    """
+    Maps items of an export file to rows of one table.
+
+    `columns` is a list of (column, path) pairs; path is a key of the item, a
+    dotted path into nested objects ('venue.id'), a function of the item, or
+    None for a column the export does not provide. Tables in USER_TABLES get a
+    trailing userId column with the id of the export's owner. Rows of tables
+    in MERGE_KEYS are merged with earlier imports on the other columns.
+    """
+
+    def __init__(self, table, columns, label=None, verb='INSERT OR IGNORE'):
+        self.table = table
+        self.per_user = table in USER_TABLES
+        user_column = ['userId'] if self.per_user else []
+        self.columns = [column for column, _ in columns] + user_column
+        self.merged = ([column for column, path in columns if path is not None]
+                       + user_column)
+        self.label = label or table
+        self.verb = verb
+        self.row = _row_builder([path for _, path in columns])
+
+    def merger(self, conn, shared=False):
+        """A RowMerger for the table, or None if its rows are not merged."""
+        if self.table not in MERGE_KEYS:
+            return None
+        return RowMerger(conn, self.table, self.columns, self.merged, shared=shared)
+
+    def loader(self, conn, manifest, merger=None, rank=0):
+        merge_all = manifest.full or (merger is not None and merger.ranks is not None)
+        return BulkLoader(conn, self.table, self.columns, verb=self.verb,
+                          label=self.label, watermark=manifest.watermark(self.table),
+                          merger=merger, merge_all=merge_all, rank=rank)
+
+
+class Source:
+    """
+    One kind of export file and the tables its items feed.
+
+    `name` is the file name without .json; with multi_file=True every file
+    starting with it is read (checkins1.json, checkins2.json.gz, ...; see
+    ExportReader for the compressed variants). Items are the elements of the
+    top-level `key` array, or the whole document when key is None. `venue`
+    gives the paths of VENUE_COLUMNS for the VenueAccumulator (as a list, or a
+    function returning the row or None); `name` is then also its
+    VENUE_SOURCE_PRIORITY key. `extract` replaces the table mappings for
+    layouts they cannot describe and yields (table, row) pairs per item.
+    """
+
+    def __init__(self, name, tables, key='items', venue=None, extract=None,
+                 multi_file=False, description=None):
+        self.name = name
+        self.tables = tables
+        self.key = key
+        self.multi_file = multi_file
+        self.description = description or name.replace('_', ' ')
+        self.extract = extract
+        if venue is None or callable(venue):
+            self.venue = venue
+        else:
+            venue_row = _row_builder(venue)
+            self.venue = lambda item: (name, *venue_row(item))
+
+    def files(self, export):
+        if self.multi_file:
+            return export.list(self.name)
+        filename = export.find(f'{self.name}.json')
+        return [filename] if filename else []
+
+    def rows(self, item, user_id=None):
+        """Yields the (table, row) pairs of one item, venues included."""
+        if self.venue is not None:
+            venue = self.venue(item)
+            if venue is not None:
+                yield 'venues', venue
+        if self.extract is not None:
+            yield from self.extract(item)
+            return
+        for mapping in self.tables:
+            if mapping.per_user:
+                yield mapping.table, mapping.row(item) + (user_id,)
+            else:
+                yield mapping.table, mapping.row(item)
+
+
+def checkin_venue_row(item):
+    venue = item.get('venue', {})
+    venue_id = venue.get('id')
+    if not venue_id:
+        return None
+
+    location = venue.get('location', {})
+    venue_address_from_location = location.get('address')
+    venue_formatted_address_list = location.get('formattedAddress', [])
+
+    # Prioritize 'address' field, but if not available, use 'formattedAddress'
+    if venue_address_from_location:
+        venue_address = venue_address_from_location
+    elif venue_formatted_address_list:
+        venue_address = ", ".join(venue_formatted_address_list)
+    else:
+        venue_address = None
+
+    venue_lat = item.get('lat', location.get('lat')) # Corrected extraction
+    venue_lng = item.get('lng', location.get('lng')) # Corrected extraction
+    return ('checkins', venue_id, venue.get('name'), venue_address, venue_lat,
+            venue_lng, venue.get('url'))
+
+
+def photo_checkin_id(item):
+    """The check-in id ending relatedItemUrl (.../checkin/<hex id>), or None."""
+    related_item_url = item.get('relatedItemUrl')
+    if related_item_url:
+        _, found, checkin_id = related_item_url.partition('checkin/')
+        checkin_id = checkin_id.partition('/')[0].partition('?')[0]
+        if found and checkin_id and not checkin_id.strip('0123456789abcdef'):
+            return checkin_id
+    return None
+
+
+def users_document_rows(data):
+    """users.json is one object: the exporting user under 'self' plus friends."""
+    self_user = data.get('self', {})
+    if self_user:
+        contact = self_user.get('contact', {})
+        photo = self_user.get('photo', {})
+        yield 'users', (
+            self_user.get('id'),
+            self_user.get('firstName'),
+            self_user.get('lastName'),
+            self_user.get('email'),
+            self_user.get('gender'),
+            self_user.get('homeCity'),
+            self_user.get('bio'),
+            contact.get('phone'),
+            contact.get('verifiedPhone') == 'true',
+            contact.get('verifiedEmail') == 'true',
+            contact.get('facebook'),
+            photo.get('prefix'),
+            photo.get('suffix'),
+            self_user.get('birthday'),
+            self_user.get('displayName'),
+            self_user.get('tips', {}).get('count'),
+            # Assuming the first group is relevant
+            self_user.get('lists', {}).get('groups', [{}])[0].get('count'),
+        )
 
+    for friend in data.get('friends', {}).get('items', []):
+        yield 'friends', (self_user.get('id'), friend.get('id'),
+                          friend.get('firstName'), friend.get('lastName'),
+                          friend.get('canonicalUrl'))
+
+
+# Every export file the importer understands, keyed by Source.name. Columns
+# map 1:1 to TABLE_SCHEMAS; watermarks come from WATERMARK_COLUMNS.
+SOURCES = {source.name: source for source in [
+    Source('checkins', [
+        TableMapping('checkins', [
+            ('id', 'id'),
+            ('createdAt', 'createdAt'),
+            ('venueId', 'venue.id'),
+            ('shout', 'shout'),
+            ('timeZone', 'timeZone'),
+        ], label='checkin'),
+    ], venue=checkin_venue_row, multi_file=True),
+    Source('photos', [
+        TableMapping('photos', [
+            ('id', 'id'),
+            ('checkinId', photo_checkin_id),
+            ('createdAt', 'createdAt'),
+            ('fullUrl', 'fullUrl'),
+            ('localPath', None), # Filled from the pix directory by link_photos()
+            ('width', 'width'),
+            ('height', 'height'),
+        ], label='photo'),
+    ], multi_file=True),
+    Source('users', [
+        TableMapping('users', [(column, column) for column in [
+            'id', 'firstName', 'lastName', 'email', 'gender', 'homeCity', 'bio',
+            'phone', 'verifiedPhone', 'verifiedEmail', 'facebook', 'photoPrefix',
+            'photoSuffix', 'birthday', 'displayName', 'tipsCount', 'listsCount',
+        ]], label='user'),
+        TableMapping('friends', [(column, column) for column in [
+            'userId', 'friendId', 'friendFirstName', 'friendLastName',
+            'friendCanonicalUrl',
+        ]], label='friend'),
+    ], key=None, extract=users_document_rows, description='user'),
+    Source('visits', [
+        TableMapping('visits', [(column, column) for column in [
+            'id', 'userId', 'timeArrived', 'timeDeparted', 'os', 'osVersion',
+            'deviceModel', 'isTraveling', 'latitude', 'longitude', 'city', 'state',
+            'countryCode', 'locationType',
+        ]], label='visit'),
+    ]),
+    Source('unconfirmed_visits', [
+        TableMapping('unconfirmed_visits', [(column, column) for column in [
+            'id', 'startTime', 'endTime', 'venueId', 'lat', 'lng',
+        ]], label='unconfirmed visit'),
+    ], venue=['venueId', 'venue.name', None, 'lat', 'lng', 'venue.url']),
+    Source('tips', [
+        TableMapping('tips', [
+            ('id', 'id'),
+            ('createdAt', 'createdAt'),
+            ('text', 'text'),
+            ('type', 'type'),
+            ('canonicalUrl', 'canonicalUrl'),
+            ('viewCount', 'viewCount'),
+            ('agreeCount', 'agreeCount'),
+            ('disagreeCount', 'disagreeCount'),
+            ('userId', 'user.id'),
+            ('venueId', 'venue.id'),
+        ], label='tip'),
+    ], venue=['venue.id', 'venue.name', None, None, None, None]),
+    Source('comments', [
+        TableMapping('comments', [
+            ('userId', 'userId'),
+            ('time', 'time'),
+            ('comment', 'comment'),
+        ], label='comment from user', verb='INSERT'),
+    ]),
+    Source('venueRatings', [
+        TableMapping('venue_ratings', [
+            ('id', 'id'),
+            ('name', 'name'),
+            ('url', 'url'),
+        ], label='venue rating'),
+    ], key='venueLikes', venue=['id', 'name', None, None, None, 'url'],
+       description='venue ratings'),
+    Source('expertise', [
+        TableMapping('expertise', [(column, column) for column in [
+            'id', 'type', 'timestamp', 'lastModified',
+        ]]),
+    ]),
+    Source('plans', [
+        TableMapping('plans', [(column, column) for column in [
+            'id', 'userId', 'createdAt', 'modifiedTime', 'isBroadcast', 'type',
+        ]], label='plan'),
+    ]),
+    Source('shares', [
+        TableMapping('shares', [(column, column) for column in [
+            'id', 'sharedAt', 'state', 'type',
+        ]], label='share'),
+    ]),
+]}
+
+# Batches each parse worker may have waiting in the queue before it blocks.
+PARSE_QUEUE_DEPTH = 4
+
+_parse_queue = None
+
+
+def parse_file(export, name, filename, emit, stream=False, batch_size=BATCH_SIZE,
+               checkpoint_every=0, resume=None):
+    """
+    Parses one export file of SOURCES[name] and calls emit(rows, checkpoint)
+    with lists of (table, row) pairs. Venue rows are merged locally first and
+    emitted once at the end, since most check-ins repeat a venue that was
+    already seen.
+
+    Every `checkpoint_every` items the venues merged so far are emitted too,
+    with checkpoint = (items, byte offset) meaning every row of the first
+    `items` items has now been emitted; otherwise checkpoint is None. `resume`
+    is such a checkpoint from an interrupted run to continue after.
+    """
+    rows = SOURCES[name].rows
+    user_id = export.user_id
+    venues = VenueAccumulator()
+    batch = []
+    tell = []
+    count = resume[0] if resume else 0
+    with open_items(export, filename, key=SOURCES[name].key, stream=stream,
+                    resume=resume, tell=tell) as items:
+        for item in items:
+            for table, row in rows(item, user_id):
+                if table == 'venues':
+                    venues.add(row)
+                else:
+                    batch.append((table, row))
+            count += 1
+            if checkpoint_every and count % checkpoint_every == 0:
+                batch.extend(('venues', (name, *row)) for row in venues.rows())
+                venues = VenueAccumulator()
+                emit(batch, (count, tell[0]() if tell[0] else None))
+                batch = []
+            elif len(batch) >= batch_size:
+                emit(batch, None)
+                batch = []
+    batch.extend(('venues', (name, *row)) for row in venues.rows())
+    emit(batch, None)
+
+
+def _init_parse_worker(queue):
+    global _parse_queue
+    _parse_queue = queue
+
+
+def _parse_file_worker(task, export_path, user_id, name, filename, stream, batch_size,
+                       checkpoint_every, resume):
+    # Runs in a worker process; every message is (task, rows, checkpoint, error)
+    # and rows=None marks the end of the file.
+    def emit(rows, checkpoint):
+        _parse_queue.put((task, rows, checkpoint, None))
 
+    try:
+        with ExportReader(export_path, user_id) as export:
+            parse_file(export, name, filename, emit, stream, batch_size,
+                       checkpoint_every, resume)
+        _parse_queue.put((task, None, None, None))
+    except Exception as e:
+        _parse_queue.put((task, None, None, f"{type(e).__name__}: {e}"))
+
+
+def parse_files(tasks, writers, stream=False, workers=1, checkpoint=None,
+                checkpoint_every=0):
+    """
+    Parses (export, source name, filename, resume) tasks, `export` being an
+    ExportReader, and hands every row to writers[export][table].add. See
+    parse_file for resume; after the rows of each checkpoint have been
+    handed over, checkpoint(task, (items, byte offset)) is called.
+
+    With workers > 1 the files are parsed in a process pool and this process
+    is the only SQLite writer: it drains a bounded queue of row batches, so
+    workers block (backpressure) when writing falls behind parsing.
+
+    Returns the list of tasks whose file could not be parsed completely.
+    """
+    def write(task, rows, progress):
+        export_writers = writers[task[0]]
+        for table, row in rows:
+            export_writers[table].add(row)
+        if progress is not None and checkpoint is not None:
+            checkpoint(task, progress)
+
+    failed = []
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            export, name, filename, resume = task
+            print(f"Processing {name} file: {filename}"
+                  + (f" (resuming after item {resume[0]})" if resume else ""))
+            try:
+                parse_file(export, name, filename,
+                           lambda rows, progress: write(task, rows, progress),
+                           stream, BATCH_SIZE, checkpoint_every, resume)
+            except Exception as e:
+                print(f"Error processing {filename}: {e}")
+                failed.append(task)
+        return failed
+
+    queue = multiprocessing.Queue(maxsize=workers * PARSE_QUEUE_DEPTH)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_parse_worker,
+                             initargs=(queue,)) as pool:
+        pending = [pool.submit(_parse_file_worker, i, export.path, export.user_id, name,
+                               filename, stream, BATCH_SIZE, checkpoint_every, resume)
+                   for i, (export, name, filename, resume) in enumerate(tasks)]
+        print(f"Parsing {len(tasks)} files with {workers} worker processes: "
+              f"{', '.join(filename for _, _, filename, _ in tasks)}")
+        for _, _, filename, resume in tasks:
+            if resume:
+                print(f"Resuming {filename} after item {resume[0]}")
+        unfinished = set(range(len(tasks)))
+        while unfinished:
+            try:
+                i, rows, progress, error = queue.get(timeout=1)
+            except Empty:
+                # A worker that died without reporting never sends its end
+                # marker
+                for i, future in enumerate(pending):
+                    if i in unfinished and future.done() and future.exception():
+                        unfinished.discard(i)
+                        if tasks[i] not in failed:
+                            print(f"Error processing {tasks[i][2]}: "
+                                  f"{future.exception()}")
+                            failed.append(tasks[i])
+                continue
+            if rows is not None:
+                if tasks[i] in failed:
+                    continue # Writing an earlier batch failed; drop the rest
                 try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO checkins (id, createdAt, venueId, shout, timeZone)
-
-
-                        VALUES (?, ?, ?, ?, ?)
-
-
-                    ''', (checkin_id, created_at, venue_id, shout, time_zone))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_checkins_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing checkin {checkin_id} from {filename}: {e}")
-
-
-    
-
-
-    conn.commit()
-
-
-    conn.close()
-
-
-    print(f"Finished importing checkins data. Total checkins imported: {total_checkins_imported}")
-
-
-
-
-
-def import_photos_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    photo_files = [f for f in os.listdir('.') if f.startswith('photos') and f.endswith('.json')]
-
-
-    
-
-
-    total_photos_imported = 0
-
-
-
-
-
-    for filename in photo_files:
-
-
-        print(f"Processing photos file: {filename}")
-
-
-        with open(filename, 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            for item in data.get('items', []):
-
-
-                photo_id = item.get('id')
-
-
-                created_at = item.get('createdAt')
-
-
-                full_url = item.get('fullUrl')
-
-
-                width = item.get('width')
-
-
-                height = item.get('height')
-
-
-                related_item_url = item.get('relatedItemUrl')
-
-
-
-
-
-                checkin_id = None
-
-
-                if related_item_url:
-
-
-                    match = re.search(r'checkin/([a-f0-9]+)', related_item_url)
-
-
-                    if match:
-
-
-                        checkin_id = match.group(1)
-
-
-                
-
-
-                local_path = os.path.join(PIX_DIR, f"{photo_id}.jpg") # Assuming all photos are JPG and named by their ID
-
-
-
-
-
+                    write(tasks[i], rows, progress)
+                except Exception as e:
+                    # Fails the task as in the serial branch. Leaving the loop
+                    # instead would hang the pool's shutdown on workers blocked
+                    # putting batches into the full queue
+                    print(f"Error processing {tasks[i][2]}: {e}")
+                    failed.append(tasks[i])
+                continue
+            unfinished.discard(i)
+            if error and tasks[i] not in failed:
+                print(f"Error processing {tasks[i][2]}: {error}")
+                failed.append(tasks[i])
+    return failed
+
+
+# Items of one file between checkpoints of a resumable import (--checkpoint).
+CHECKPOINT_ITEMS = 100_000
+
+# Profiler stage name and the SOURCES imported in it, in import order.
+# Check-ins and photos share a stage so their files are parsed in one pool.
+IMPORT_STAGES = [
+    ('checkins_photos', ['checkins', 'photos']),
+    ('users', ['users']),
+    ('visits', ['visits']),
+    ('unconfirmed_visits', ['unconfirmed_visits']),
+    ('tips', ['tips']),
+    ('comments', ['comments']),
+    ('venue_ratings', ['venueRatings']),
+    ('expertise', ['expertise']),
+    ('plans', ['plans']),
+    ('shares', ['shares']),
+]
+
+
+def import_sources(conn, exports, names, manifests, venues, stream=False, workers=1,
+                   checkpoint_every=0):
+    """
+    Imports the export files of the SOURCES in `names` from every ExportReader
+    in `exports`, each with its ImportManifest in `manifests`, through one
+    BulkLoader per export and table. The files of all sources and exports are
+    parsed together, in parallel when workers > 1 and there is more than one
+    file. Rows are merged with what earlier imports and earlier `exports` stored
+    through one RowMerger per table (see BulkLoader).
+
+    With checkpoint_every > 0 the work is committed every that many items of
+    a file, together with the file's progress and the venues seen so far, so
+    an interrupted import can be continued with --resume.
+    """
+    sources = [SOURCES[name] for name in names]
+    tasks = []
+    for export in exports:
+        manifest = manifests[export]
+        for source in sources:
+            files = source.files(export)
+            if not files:
+                where = '' if len(exports) == 1 else f' in {export.path}'
+                print(f"{source.name}.json not found{where}. "
+                      f"Skipping {source.description} data import.")
+            for filename in files:
+                if manifest.is_unchanged(filename):
+                    print(f"{filename} unchanged since last import. Skipping.")
+                else:
+                    tasks.append((export, source.name, filename,
+                                  manifest.resume_point(filename)))
+    if not tasks:
+        return
+
+    mappings = [mapping for source in sources for mapping in source.tables]
+    task_exports = list(dict.fromkeys(export for export, _, _, _ in tasks))
+    # Several exports of one account overlap; their rows are ranked by export
+    # order
+    shared = len({export.user_id for export in task_exports}) < len(task_exports)
+    mergers = [mapping.merger(conn, shared) for mapping in mappings]
+    with ExitStack() as stack:
+        loaders = {
+            export: [stack.enter_context(mapping.loader(conn, manifests[export], merger,
+                                                        rank=exports.index(export)))
+                     for mapping, merger in zip(mappings, mergers)]
+            for export in task_exports}
+        writers = {}
+        for export in task_exports:
+            writers[export] = {mapping.table: loader
+                               for mapping, loader in zip(mappings, loaders[export])}
+            writers[export]['venues'] = _ExportVenues(venues, exports.index(export))
+
+        def checkpoint(task, progress):
+            # Commits everything handed over so far together with the file's
+            # progress
+            for export_loaders in loaders.values():
+                for loader in export_loaders:
+                    loader.flush()
+            manifests[task[0]].checkpoint(task[2], *progress)
+            write_venues(conn, venues)
+            conn.commit()
+
+        failed = parse_files(tasks, writers, stream=stream, workers=workers,
+                             checkpoint=checkpoint, checkpoint_every=checkpoint_every)
+
+    done = [task for task in tasks if task not in failed]
+    for export in task_exports:
+        manifests[export].finish([filename for task_export, _, filename, _ in done
+                                  if task_export is export], *loaders[export])
+    for i, mapping in enumerate(mappings):
+        table_loaders = [loaders[export][i] for export in task_exports]
+        written = sum(loader.written for loader in table_loaders)
+        table = mapping.table.replace('_', ' ')
+        print(f"Finished importing {table} data. Total {table} imported: {written}")
+        updated, identical, superseded = (
+            sum(getattr(loader, counter) for loader in table_loaders)
+            for counter in ('updated', 'identical', 'superseded'))
+        if updated or identical or superseded:
+            print(f"Merged {table} with earlier imports: {written} new, "
+                  f"{updated} updated, {identical} identical skipped"
+                  + (f", {superseded} superseded by a later export"
+                     if superseded else "")
+                  + ".")
+
+
+def open_exports(sources):
+    """
+    Opens an ExportReader per source and reads the id of the account each one
+    belongs to.
+    """
+    exports = []
+    try:
+        for source in sources:
+            exports.append(ExportReader(source))
+            if exports[-1].read_user_id():
+                print(f"Export '{source}' belongs to user {exports[-1].user_id}.")
+    except Exception:
+        for export in exports:
+            export.close()
+        raise
+    return exports
+
+
+def run_import(conn, exports, args, profiler, pragmas=IMPORT_PRAGMAS, resume=None,
+               changes=None):
+    """
+    Runs every import stage once over `exports` with the options in `args`.
+    Returns True if the database changed, counting from `changes`, a value of
+    conn.total_changes (default: the current one).
+    """
+    changes = conn.total_changes if changes is None else changes
+    with import_pragmas(conn, pragmas):
+        resume = args.resume if resume is None else resume
+        manifests = {export: ImportManifest(conn, export, full=args.full, resume=resume)
+                     for export in exports}
+        venues = VenueAccumulator() # Filled by every importer that sees venue data
+        for stage, names in IMPORT_STAGES:
+            profiler.run(stage, import_sources, conn, exports, names, manifests, venues,
+                         stream=args.stream, workers=args.workers,
+                         checkpoint_every=args.checkpoint)
+        profiler.run('venues', import_venues_data, conn, venues)
+        # Taken before photo linking, whose temporary table counts as changes
+        # too
+        changed = conn.total_changes > changes
+        changed = profiler.run('photo_links', link_photos, conn, exports) > 0 or changed
+        profiler.run('map_clusters', build_map_clusters, conn, changed=changed)
+        profiler.run('indexes', build_indexes, conn)
+        directory = None if args.no_snapshots else args.snapshots
+        profiler.run('snapshots', export_snapshots, conn, directory, changed=changed)
+    return changed
+
+
+def drop_signature(sources):
+    """
+    (path, size, mtime) of the export files of every source, and of their
+    pix/ directories, whose mtime changes when photos are added or removed.
+    Two polls with the same signature mean nothing was dropped in between.
+    """
+    signature = []
+    for source in sources:
+        paths = [source]
+        if os.path.isdir(source):
+            with os.scandir(source) as entries:
+                paths = [entry.path for entry in entries
+                         if entry.is_file() and entry.name.endswith(EXPORT_SUFFIXES)]
+            paths.append(os.path.join(source, PIX_DIR))
+        for path in sorted(paths):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature.append((path, stat.st_size, stat.st_mtime_ns))
+    return signature
+
+
+def notify_backend(url):
+    """
+    Asks the dashboard backend to drop its cached aggregates; failures are
+    reported, not raised.
+    """
+    request = urllib.request.Request(url, data=b'', method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            print(f"Backend caches invalidated ({response.status}).")
+    except (urllib.error.URLError, OSError) as e:
+        print(f"Could not notify the backend at {url}: {e}")
+
+
+def watch(conn, sources, exports, args):
+    """
+    Polls `sources` every args.interval seconds and imports them again once
+    new or changed files have stopped changing for one poll, so files still
+    being copied are not read half-written. Each run is incremental (the
+    manifest skips unchanged files, watermarks skip old items) and commits
+    every args.checkpoint items in WAL mode, so the dashboard keeps reading
+    throughout. After a run that changed the database, args.notify is posted
+    to. Runs until interrupted.
+    """
+    conn.execute('PRAGMA journal_mode = WAL')
+    print(f"Watching {', '.join(sources)} every {args.interval}s. "
+          "Press Ctrl+C to stop.")
+    previous = drop_signature(sources) # The files present now are imported right away
+    imported = None
+    try:
+        while True:
+            signature = drop_signature(sources)
+            if signature != imported and signature == previous:
                 try:
+                    if exports is None:
+                        exports = open_exports(sources)
+                    profiler = ImportProfiler(enabled=args.profile is not None)
+                    # An interrupted run is always continued from its checkpoints
+                    changed = run_import(conn, exports, args, profiler,
+                                         pragmas=WATCH_PRAGMAS, resume=True)
+                    profiler.report(conn, args.profile)
+                    imported = signature
+                    print(f"Import finished at {time.strftime('%Y-%m-%d %H:%M:%S')}"
+                          + ("." if changed else "; nothing new."))
+                    if changed and args.notify:
+                        notify_backend(args.notify)
+                except (OSError, zipfile.BadZipFile, ValueError, sqlite3.Error) as e:
+                    conn.rollback()
+                    print(f"Import failed: {e}. Retrying at the next poll.")
+                finally:
+                    for export in exports or []:
+                        export.close()
+                    exports = None
+            previous = signature
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import a Swarm/Foursquare JSON export into SQLite.")
+    parser.add_argument('--source', action='append',
+                        help="Directory with the export files, or the export .zip "
+                             "itself (read without extracting). Files may be .json, "
+                             ".json.gz or .json.zst. Repeat to import the exports of "
+                             "several accounts into one database. Default: the "
+                             "current directory.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Parse export files incrementally instead of loading each "
+                             "one into memory. Memory per file stays near "
+                             f"{STREAM_CHUNK_SIZE // 1024} KiB plus the largest single "
+                             "item.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes used to parse multi-file exports "
+                             "(checkins*.json, photos*.json) in parallel. Default: "
+                             "number of CPUs; 1 parses in the importing process.")
+    parser.add_argument('--full', action='store_true',
+                        help="Re-import every file even if the import manifest says it "
+                             "is unchanged.")
+    parser.add_argument('--checkpoint', type=int, metavar='N',
+                        help="Commit the import every N items of a file and record the "
+                             "progress, so an interrupted import can be continued with "
+                             f"--resume. Default: {CHECKPOINT_ITEMS} "
+                             f"({WATCH_CHECKPOINT_ITEMS} with --watch); 0 commits once "
+                             "per file.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue files whose previous import was interrupted "
+                             "after their last checkpoint.")
+    parser.add_argument('--staged', nargs='?', const='file', choices=['file', 'memory'],
+                        help="Build the database in a temporary file (default) or in "
+                             "memory, seeded from the existing one, and atomically "
+                             "replace it only once the import has finished. Readers "
+                             "never see a partial import; 'memory' needs RAM for the "
+                             "whole database.")
+    parser.add_argument('--snapshots', default=snapshots.SNAPSHOT_DIR, metavar='DIR',
+                        help="Directory for the Arrow snapshots of check-ins, visits "
+                             "and photos written after the import (needs pyarrow). "
+                             f"Default: {snapshots.SNAPSHOT_DIR}.")
+    parser.add_argument('--no-snapshots', action='store_true',
+                        help="Do not write the Arrow snapshots.")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running and import new or changed files dropped "
+                             "into the sources, polling every --interval seconds. "
+                             "Imports are incremental and use small WAL transactions "
+                             "on the live database, so the dashboard can keep reading "
+                             "it.")
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL,
+                        metavar='SECONDS',
+                        help="Seconds between polls with --watch "
+                             f"(default: {WATCH_INTERVAL}).")
+    parser.add_argument('--notify', default=NOTIFY_URL, metavar='URL',
+                        help="With --watch, POST to URL after each import that "
+                             "changed the database so the dashboard drops its cached "
+                             f"aggregates (default: {NOTIFY_URL}; '' to disable).")
+    parser.add_argument('--profile', nargs='?', const='import_profile.json',
+                        metavar='REPORT',
+                        help="Record wall/CPU time, rows and peak memory per import "
+                             "stage, print a summary and write it to REPORT (default: "
+                             "import_profile.json) and the import_runs table.")
+    args = parser.parse_args(argv)
+    sources = args.source or ['.']
+    if args.watch and args.staged:
+        parser.error("--watch imports into the live database in small transactions; "
+                     "it cannot be combined with --staged.")
+    if args.checkpoint is None:
+        args.checkpoint = WATCH_CHECKPOINT_ITEMS if args.watch else CHECKPOINT_ITEMS
+    try:
+        exports = open_exports(sources)
+    except (OSError, zipfile.BadZipFile, ValueError) as e:
+        parser.error(str(e))
+
+    if args.staged:
+        conn, staging_path = open_staging_database(args.staged)
+    else:
+        conn, staging_path = sqlite3.connect(DATABASE_NAME), None
+    try:
+        setup_database(conn)
+        if args.watch:
+            watch(conn, sources, exports, args)
+            return
+
+        profiler = ImportProfiler(enabled=args.profile is not None)
+        # Counted from 0 so schema migrations in setup_database count as changes
+        # too
+        run_import(conn, exports, args, profiler,
+                   pragmas=STAGED_PRAGMAS if args.staged else IMPORT_PRAGMAS, changes=0)
+        profiler.report(conn, args.profile)
+        if args.staged:
+            publish_database(conn, staging_path)
+            staging_path = None
+    finally:
+        conn.close()
+        for export in exports:
+            export.close()
+        if staging_path is not None and os.path.exists(staging_path):
+            os.remove(staging_path) # The import failed; the live database is untouched
 
+    print("Data import process completed.")
 
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO photos (id, checkinId, createdAt, fullUrl, localPath, width, height)
-
-
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-
-
-                    ''', (photo_id, checkin_id, created_at, full_url, local_path, width, height))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_photos_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing photo {photo_id} from {filename}: {e}")
-
-
-    
-
-
-    conn.commit()
-
-
-    conn.close()
-
-
-    print(f"Finished importing photos data. Total photos imported: {total_photos_imported}")
-
-
-
-
-
-def import_users_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-    
-
-
-    total_users_imported = 0
-
-
-    total_friends_imported = 0
-
-
-
-
-
-    try:
-
-
-        with open('users.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            
-
-
-            # Import self user data
-
-
-            self_user = data.get('self', {})
-
-
-            if self_user:
-
-
-                user_id = self_user.get('id')
-
-
-                firstName = self_user.get('firstName')
-
-
-                lastName = self_user.get('lastName')
-
-
-                email = self_user.get('email')
-
-
-                gender = self_user.get('gender')
-
-
-                homeCity = self_user.get('homeCity')
-
-
-                bio = self_user.get('bio')
-
-
-                
-
-
-                contact = self_user.get('contact', {})
-
-
-                phone = contact.get('phone')
-
-
-                verifiedPhone = contact.get('verifiedPhone') == 'true'
-
-
-                verifiedEmail = contact.get('verifiedEmail') == 'true'
-
-
-                facebook = contact.get('facebook')
-
-
-
-
-
-                photo = self_user.get('photo', {})
-
-
-                photoPrefix = photo.get('prefix')
-
-
-                photoSuffix = photo.get('suffix')
-
-
-
-
-
-                birthday = self_user.get('birthday')
-
-
-                displayName = self_user.get('displayName')
-
-
-                tipsCount = self_user.get('tips', {}).get('count')
-
-
-                listsCount = self_user.get('lists', {}).get('groups', [{}])[0].get('count') # Assuming first group is relevant
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO users (id, firstName, lastName, email, gender, homeCity, bio, phone, verifiedPhone, verifiedEmail, facebook, photoPrefix, photoSuffix, birthday, displayName, tipsCount, listsCount)
-
-
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-
-
-                    ''', (user_id, firstName, lastName, email, gender, homeCity, bio, phone, verifiedPhone, verifiedEmail, facebook, photoPrefix, photoSuffix, birthday, displayName, tipsCount, listsCount))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_users_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing user {user_id}: {e}")
-
-
-
-
-
-            # Import friends data
-
-
-            friends_list = data.get('friends', {}).get('items', [])
-
-
-            for friend in friends_list:
-
-
-                friend_id = friend.get('id')
-
-
-                friend_firstName = friend.get('firstName')
-
-
-                friend_lastName = friend.get('lastName')
-
-
-                friend_canonicalUrl = friend.get('canonicalUrl')
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO friends (userId, friendId, friendFirstName, friendLastName, friendCanonicalUrl)
-
-
-                        VALUES (?, ?, ?, ?, ?)
-
-
-                    ''', (self_user.get('id'), friend_id, friend_firstName, friend_lastName, friend_canonicalUrl))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_friends_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing friend {friend_id} for user {self_user.get('id')}: {e}")
-
-
-
-
-
-    except FileNotFoundError:
-
-
-        print("users.json not found. Skipping user data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing users.json: {e}")
-
-
-
-
-
-    conn.commit()
-
-
-    conn.close()
-
-
-    print(f"Finished importing users data. Total users imported: {total_users_imported}. Total friends imported: {total_friends_imported}")
-
-
-
-
-
-def import_visits_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('visits.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_visits_imported = 0
-
-
-            for item in data.get('items', []):
-
-
-                visit_id = item.get('id')
-
-
-                userId = item.get('userId')
-
-
-                timeArrived = item.get('timeArrived')
-
-
-                timeDeparted = item.get('timeDeparted')
-
-
-                os = item.get('os')
-
-
-                osVersion = item.get('osVersion')
-
-
-                deviceModel = item.get('deviceModel')
-
-
-                isTraveling = item.get('isTraveling')
-
-
-                latitude = item.get('latitude')
-
-
-                longitude = item.get('longitude')
-
-
-                city = item.get('city')
-
-
-                state = item.get('state')
-
-
-                countryCode = item.get('countryCode')
-
-
-                locationType = item.get('locationType')
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO visits (id, userId, timeArrived, timeDeparted, os, osVersion, deviceModel, isTraveling, latitude, longitude, city, state, countryCode, locationType)
-
-
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-
-
-                    ''', (visit_id, userId, timeArrived, timeDeparted, os, osVersion, deviceModel, isTraveling, latitude, longitude, city, state, countryCode, locationType))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_visits_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing visit {visit_id}: {e}")
-
-
-        conn.commit()
-
-
-        print(f"Finished importing visits data. Total visits imported: {total_visits_imported}")
-
-
-    except FileNotFoundError:
-
-
-        print("visits.json not found. Skipping visits data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing visits.json: {e}")
-
-
-    finally:
-
-
-        conn.close()
-
-
-
-
-
-def import_unconfirmed_visits_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('unconfirmed_visits.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_unconfirmed_visits_imported = 0
-
-
-            for item in data.get('items', []):
-
-
-                visit_id = item.get('id')
-
-
-                startTime = item.get('startTime')
-
-
-                endTime = item.get('endTime')
-
-
-                venueId = item.get('venueId')
-
-
-                lat = item.get('lat')
-
-
-                lng = item.get('lng')
-
-
-                # Removed venueName, venueUrl as they are in the venues table
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                                                INSERT OR IGNORE INTO unconfirmed_visits (id, startTime, endTime, venueId, lat, lng)
-
-
-                                                VALUES (?, ?, ?, ?, ?, ?)
-
-
-                                            ''', (visit_id, startTime, endTime, venueId, lat, lng))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_unconfirmed_visits_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing unconfirmed visit {visit_id}: {e}")
-
-
-        conn.commit()
-
-
-        print(f"Finished importing unconfirmed visits data. Total unconfirmed visits imported: {total_unconfirmed_visits_imported}")
-
-
-    except FileNotFoundError:
-
-
-        print("unconfirmed_visits.json not found. Skipping unconfirmed visits data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing unconfirmed_visits.json: {e}")
-
-
-    finally:
-
-
-        conn.close()
-
-
-
-
-
-def import_tips_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('tips.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_tips_imported = 0
-
-
-            for item in data.get('items', []):
-
-
-                tip_id = item.get('id')
-
-
-                createdAt = item.get('createdAt')
-
-
-                text = item.get('text')
-
-
-                tip_type = item.get('type')
-
-
-                canonicalUrl = item.get('canonicalUrl')
-
-
-                viewCount = item.get('viewCount')
-
-
-                agreeCount = item.get('agreeCount')
-
-
-                disagreeCount = item.get('disagreeCount')
-
-
-                
-
-
-                user = item.get('user', {})
-
-
-                userId = user.get('id')
-
-
-
-
-
-                venue = item.get('venue', {})
-
-
-                venueId = venue.get('id')
-
-
-                # Removed venueName as it is in the venues table
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO tips (id, createdAt, text, type, canonicalUrl, viewCount, agreeCount, disagreeCount, userId, venueId)
-
-
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-
-
-                    ''', (tip_id, createdAt, text, tip_type, canonicalUrl, viewCount, agreeCount, disagreeCount, userId, venueId))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_tips_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing tip {tip_id}: {e}")
-
-
-        conn.commit()
-
-
-        print(f"Finished importing tips data. Total tips imported: {total_tips_imported}")
-
-
-    except FileNotFoundError:
-
-
-        print("tips.json not found. Skipping tips data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing tips.json: {e}")
-
-
-    finally:
-
-
-        conn.close()
-
-
-
-
-
-def import_comments_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('comments.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_comments_imported = 0
-
-
-            for item in data.get('items', []):
-
-
-                userId = item.get('userId')
-
-
-                time = item.get('time')
-
-
-                comment = item.get('comment')
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT INTO comments (userId, time, comment)
-
-
-                        VALUES (?, ?, ?)
-
-
-                    ''', (userId, time, comment))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_comments_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing comment from user {userId} at {time}: {e}")
-
-
-        conn.commit()
-
-
-        print(f"Finished importing comments data. Total comments imported: {total_comments_imported}")
-
-
-    except FileNotFoundError:
-
-
-        print("comments.json not found. Skipping comments data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing comments.json: {e}")
-
-
-    finally:
-
-
-        conn.close()
-
-
-
-
-
-def import_venue_ratings_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('venueRatings.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_venue_ratings_imported = 0
-
-
-            for item in data.get('venueLikes', []): # "venueLikes" is the key here
-
-
-                venue_id = item.get('id')
-
-
-                name = item.get('name')
-
-
-                url = item.get('url')
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO venue_ratings (id, name, url)
-
-
-                        VALUES (?, ?, ?)
-
-
-                    ''', (venue_id, name, url))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_venue_ratings_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing venue rating {venue_id}: {e}")
-
-
-        conn.commit()
-
-
-        print(f"Finished importing venue ratings data. Total venue ratings imported: {total_venue_ratings_imported}")
-
-
-    except FileNotFoundError:
-
-
-        print("venueRatings.json not found. Skipping venue ratings data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing venueRatings.json: {e}")
-
-
-    finally:
-
-
-        conn.close()
-
-
-
-
-
-def import_expertise_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('expertise.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_expertise_imported = 0
-
-
-            for item in data.get('items', []):
-
-
-                item_id = item.get('id')
-
-
-                item_type = item.get('type')
-
-
-                timestamp = item.get('timestamp')
-
-
-                lastModified = item.get('lastModified')
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO expertise (id, type, timestamp, lastModified)
-
-
-                        VALUES (?, ?, ?, ?)
-
-
-                    ''', (item_id, item_type, timestamp, lastModified))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_expertise_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing expertise {item_id}: {e}")
-
-
-        conn.commit()
-
-
-        print(f"Finished importing expertise data. Total expertise imported: {total_expertise_imported}")
-
-
-    except FileNotFoundError:
-
-
-        print("expertise.json not found. Skipping expertise data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing expertise.json: {e}")
-
-
-    finally:
-
-
-        conn.close()
-
-
-
-
-
-def import_plans_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('plans.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_plans_imported = 0
-
-
-            for item in data.get('items', []):
-
-
-                plan_id = item.get('id')
-
-
-                userId = item.get('userId')
-
-
-                createdAt = item.get('createdAt')
-
-
-                modifiedTime = item.get('modifiedTime')
-
-
-                isBroadcast = item.get('isBroadcast')
-
-
-                plan_type = item.get('type')
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO plans (id, userId, createdAt, modifiedTime, isBroadcast, type)
-
-
-                        VALUES (?, ?, ?, ?, ?, ?)
-
-
-                    ''', (plan_id, userId, createdAt, modifiedTime, isBroadcast, plan_type))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_plans_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing plan {plan_id}: {e}")
-
-
-        conn.commit()
-
-
-        print(f"Finished importing plans data. Total plans imported: {total_plans_imported}")
-
-
-    except FileNotFoundError:
-
-
-        print("plans.json not found. Skipping plans data import.")
-
-
-    except Exception as e:
-
-
-        print(f"Error processing plans.json: {e}")
-
-
-    finally:
-
-
-        conn.close()
-
-
-
-
-
-def import_shares_data():
-
-
-    conn = sqlite3.connect(DATABASE_NAME)
-
-
-    cursor = conn.cursor()
-
-
-
-
-
-    try:
-
-
-        with open('shares.json', 'r', encoding='utf-8') as f:
-
-
-            data = json.load(f)
-
-
-            total_shares_imported = 0
-
-
-            for item in data.get('items', []):
-
-
-                share_id = item.get('id')
-
-
-                sharedAt = item.get('sharedAt')
-
-
-                state = item.get('state')
-
-
-                share_type = item.get('type')
-
-
-
-
-
-                try:
-
-
-                    cursor.execute('''
-
-
-                        INSERT OR IGNORE INTO shares (id, sharedAt, state, type)
-
-
-                        VALUES (?, ?, ?, ?)
-
-
-                    ''', (share_id, sharedAt, state, share_type))
-
-
-                    if cursor.rowcount > 0:
-
-
-                        total_shares_imported += 1
-
-
-                except sqlite3.Error as e:
-
-
-                    print(f"Error importing share {share_id}: {e}")
-
-
-        conn.commit()
-        print(f"Finished importing shares data. Total shares imported: {total_shares_imported}")
-    except FileNotFoundError:
-        print("shares.json not found. Skipping shares data import.")
-    except Exception as e:
-        print(f"Error processing shares.json: {e}")
-    finally:
-        conn.close()
-
-
-def main():
-
-
-    setup_database()
-
-
-
-
-
-    import_venues_data() # Ensure venues are imported first
-
-
-
-
-
-    import_checkins_data()
-
-
-
-
-
-    import_photos_data()
-
-
-
-
-
-    import_users_data()
-
-
-
-
-
-    import_visits_data()
-
-
-
-
-
-    import_unconfirmed_visits_data()
-
-
-
-
-
-    import_tips_data()
-
-
-
-
-
-    import_comments_data()
-
-
-
-
-
-    import_venue_ratings_data()
-
-
-
-
-
-    import_expertise_data()
-
-
-
-
-
-    import_plans_data()
-
-
-
-
-
-    import_shares_data()
-
-
-
-
-
-    print("Data import process completed.")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+import import_data
+
+# Generates display-size JPEG thumbnails of the photos that import_data.py
+# found in pix/, in a process pool, and records them in photo_thumbnails for
+# the backend to serve. Outputs are named by the SHA-256 of the original, so
+# identical files share their thumbnails and re-runs skip finished work.
+# Missing photo dimensions are filled in from the files along the way.
+
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZES = [160, 640] # Longest side in pixels
+JPEG_QUALITY = 82
+EXIF_ORIENTATION = 0x0112
+COMMIT_EVERY = 500
+
+
+def thumbnail_path(directory, size, content_hash):
+    return os.path.join(directory, str(size), content_hash[:2], f"{content_hash}.jpg")
+
+
+def make_thumbnails(photo_id, path, sizes, directory):
+    """
+    Runs in a worker process. Hashes the file at path and writes the missing
+    thumbnails of each size. Returns (photo_id, content hash, (width, height),
+    [(size, thumbnail path, width, height, created)], bytes read, error).
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        with Image.open(io.BytesIO(data)) as original:
+            # Dimensions as displayed, read from the header before decoding
+            width, height = original.size
+            orientation = original.getexif().get(EXIF_ORIENTATION, 1)
+            if orientation in (5, 6, 7, 8): # Rotated by 90 degrees
+                width, height = height, width
+            # Let the JPEG decoder scale down by up to 8x while decoding, which
+            # is much cheaper than decoding full size and resizing afterwards
+            original.draft('RGB', (max(sizes), max(sizes)))
+            image = ImageOps.exif_transpose(original)
+            thumbnails = []
+            for size in sorted(sizes, reverse=True):
+                target = thumbnail_path(directory, size, content_hash)
+                created = not os.path.exists(target)
+                if created:
+                    image.thumbnail((size, size), Image.LANCZOS)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    temp = f"{target}.{os.getpid()}.tmp"
+                    image.convert('RGB').save(temp, 'JPEG', quality=JPEG_QUALITY,
+                                              optimize=True)
+                    os.replace(temp, target)
+                    thumb_size = image.size
+                else:
+                    with Image.open(target) as existing:
+                        thumb_size = existing.size
+                thumbnails.append((size, target, thumb_size[0], thumb_size[1], created))
+        return photo_id, content_hash, (width, height), thumbnails, len(data), None
+    except Exception as e:
+        return photo_id, None, None, [], 0, f"{type(e).__name__}: {e}"
+
+
+def pending_photos(conn, sizes, force=False):
+    """
+    (id, local path, file size) of the photos with a local file that lack a
+    current thumbnail of one of the sizes.
+    """
+    done = {}
+    if not force:
+        rows = conn.execute('SELECT photoId, size, path, sourceSize '
+                            'FROM photo_thumbnails')
+        for photo_id, size, path, source_size in rows:
+            done.setdefault(photo_id, {})[size] = (path, source_size)
+    pending = []
+    rows = conn.execute('SELECT id, localPath, fileSize FROM photos '
+                        'WHERE localPath IS NOT NULL ORDER BY id')
+    for photo_id, local_path, file_size in rows:
+        existing = done.get(photo_id, {})
+        # A thumbnail is current if it was made from a file of the same size
+        # and is still on disk
+        if all(size in existing and existing[size][1] == file_size
+               and os.path.exists(existing[size][0]) for size in sizes):
+            continue
+        pending.append((photo_id, local_path, file_size))
+    return pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate cached thumbnails of the local photo files and fill in "
+                    "missing dimensions.")
+    default_sizes = ','.join(map(str, THUMBNAIL_SIZES))
+    parser.add_argument('--sizes', default=default_sizes,
+                        help="Comma-separated longest sides in pixels "
+                             f"(default: {default_sizes}).")
+    parser.add_argument('--out', default=THUMBNAIL_DIR,
+                        help=f"Thumbnail directory (default: {THUMBNAIL_DIR}).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of CPUs).")
+    parser.add_argument('--force', action='store_true',
+                        help="Check every photo again, not only those without current "
+                             "thumbnails.")
+    parser.add_argument('--report', metavar='FILE',
+                        help="Also write the throughput report as JSON to FILE.")
+    args = parser.parse_args(argv)
+    if Image is None:
+        parser.error("Pillow is not installed (pip install Pillow).")
+    sizes = sorted({int(size) for size in args.sizes.split(',') if size})
+
+    if not os.path.exists(import_data.DATABASE_NAME):
+        parser.error(f"Database '{import_data.DATABASE_NAME}' not found. "
+                     "Please run import_data.py first.")
+    conn = sqlite3.connect(import_data.DATABASE_NAME)
+    conn.execute(import_data.TABLE_SCHEMAS['photo_thumbnails'])
+    base = os.path.dirname(os.path.abspath(import_data.DATABASE_NAME))
+    pending = pending_photos(conn, sizes, args.force)
+    print(f"{len(pending)} photos need thumbnails ({', '.join(map(str, sizes))} px).")
+
+    stats = {
+        'photos': 0,
+        'thumbnails_created': 0,
+        'thumbnails_cached': 0,
+        'dimensions_filled': 0,
+        'errors': 0,
+        'bytes_read': 0,
+    }
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        source_sizes = {photo_id: file_size for photo_id, _, file_size in pending}
+        tasks = [(photo_id, os.path.join(base, local_path), sizes, args.out)
+                 for photo_id, local_path, _ in pending]
+        results = (pool.map(make_thumbnails, *zip(*tasks), chunksize=16)
+                   if tasks else [])
+        for result in results:
+            photo_id, content_hash, dimensions, thumbnails, bytes_read, error = result
+            if error:
+                stats['errors'] += 1
+                if stats['errors'] <= 5:
+                    print(f"Error processing photo {photo_id}: {error}")
+                continue
+            source_size = source_sizes[photo_id]
+            conn.executemany('''
+                INSERT OR REPLACE INTO photo_thumbnails
+                    (photoId, size, path, width, height, contentHash, sourceSize)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(photo_id, size, os.path.relpath(os.path.abspath(path), base),
+                   width, height, content_hash, source_size)
+                  for size, path, width, height, _ in thumbnails])
+            stats['dimensions_filled'] += conn.execute(
+                'UPDATE photos SET width = ?, height = ? '
+                'WHERE id = ? AND (width IS NULL OR height IS NULL)',
+                (*dimensions, photo_id)).rowcount
+            created = sum(1 for *_, was_created in thumbnails if was_created)
+            stats['thumbnails_created'] += created
+            stats['thumbnails_cached'] += len(thumbnails) - created
+            stats['photos'] += 1
+            stats['bytes_read'] += bytes_read
+            if stats['photos'] % COMMIT_EVERY == 0:
+                conn.commit()
+                print(f"Processed {stats['photos']} of {len(pending)} photos...")
+    conn.commit()
+    conn.close()
+
+    seconds = time.perf_counter() - start
+    mib_read = stats['bytes_read'] / (1024 * 1024)
+    stats.update({
+        'sizes': sizes,
+        'workers': args.workers,
+        'seconds': round(seconds, 3),
+        'photos_per_second': round(stats['photos'] / seconds, 1) if seconds else 0.0,
+        'mb_per_second': round(mib_read / seconds, 2) if seconds else 0.0,
+    })
+    print(f"Thumbnails done in {seconds:.1f}s: {stats['photos']} photos "
+          f"({stats['photos_per_second']:.1f}/s, "
+          f"{stats['mb_per_second']:.1f} MiB/s read), "
+          f"{stats['thumbnails_created']} thumbnails created, "
+          f"{stats['thumbnails_cached']} reused from the cache, "
+          f"{stats['dimensions_filled']} photo dimensions filled, "
+          f"{stats['errors']} errors.")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(stats, f, indent=2)
+        print(f"Thumbnail report saved to '{args.report}'.")
+
+
+if __name__ == '__main__':
+    main()
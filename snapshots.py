@@ -0,0 +1,139 @@
+import os
+import sqlite3
+import uuid
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Columnar snapshots of the tables the analytics code reads in full, written
+# by import_data.py after each import as uncompressed Arrow IPC files. They are
+# loaded memory-mapped, so a pyarrow Table (and, for numeric columns, a pandas
+# DataFrame) is available without decoding rows one by one from SQLite.
+#
+# The import_snapshots table of the database records a token per snapshot,
+# also stored in the file's schema metadata. A snapshot whose token does not
+# match the database (a newer import that wrote no snapshots, a --staged
+# import not yet published) is treated as missing, and readers fall back to
+# querying SQLite.
+
+SNAPSHOT_DIR = 'snapshots'
+BATCH_ROWS = 65_536
+
+# name: (query, column types). None takes the types declared for the table of
+# the same name, so columns added to the schema later are picked up.
+SNAPSHOTS = {
+    'checkins': ('''
+        SELECT c.id, c.createdAt, c.shout, c.timeZone, c.userId,
+               v.name AS venue_name, v.lat, v.lng, v.address, v.id AS venue_id
+        FROM checkins c
+        LEFT JOIN venues v ON c.venueId = v.id
+        ORDER BY c.createdAt, c.id
+    ''', [('id', 'TEXT'), ('createdAt', 'INTEGER'), ('shout', 'TEXT'),
+          ('timeZone', 'TEXT'), ('userId', 'TEXT'), ('venue_name', 'TEXT'),
+          ('lat', 'REAL'), ('lng', 'REAL'), ('address', 'TEXT'),
+          ('venue_id', 'TEXT')]),
+    'visits': ('SELECT * FROM visits ORDER BY timeArrived, id', None),
+    'photos': ('SELECT * FROM photos ORDER BY createdAt, id', None),
+}
+
+# Arrow type and converter per declared SQLite type. SQLite does not enforce
+# column types, so values of another type become null (or text, for TEXT).
+ARROW_TYPES = {
+    'INTEGER': 'int64',
+    'REAL': 'float64',
+    'BOOLEAN': 'bool_',
+    'TEXT': 'string',
+}
+CONVERTERS = {
+    'INTEGER': lambda v: v if type(v) is int else None,
+    'REAL': lambda v: float(v) if type(v) in (int, float) else None,
+    'BOOLEAN': lambda v: bool(v) if type(v) is int else None,
+    'TEXT': lambda v: v if v is None or type(v) is str else str(v),
+}
+
+
+def _arrow_type(declared_type):
+    return getattr(pa, ARROW_TYPES.get(declared_type, 'string'))()
+
+
+def _array(values, declared_type):
+    arrow_type = _arrow_type(declared_type)
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        convert = CONVERTERS.get(declared_type, CONVERTERS['TEXT'])
+        return pa.array(list(map(convert, values)), type=arrow_type)
+
+
+def _write_snapshot(conn, name, path, token):
+    query, columns = SNAPSHOTS[name]
+    if columns is None:
+        table_info = conn.execute(f"PRAGMA table_info({name})")
+        columns = [(column, declared_type.upper())
+                   for _, column, declared_type, *_ in table_info]
+    fields = [(column, _arrow_type(declared_type)) for column, declared_type in columns]
+    schema = pa.schema(fields, metadata={'token': token})
+
+    rows = 0
+    temp_path = f"{path}.tmp"
+    cursor = conn.execute(query)
+    with pa.OSFile(temp_path, 'wb') as sink, pa.ipc.new_file(sink, schema) as writer:
+        while True:
+            batch = cursor.fetchmany(BATCH_ROWS)
+            if not batch:
+                break
+            arrays = [_array(values, declared_type)
+                      for values, (_, declared_type) in zip(zip(*batch), columns)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            rows += len(batch)
+    os.replace(temp_path, path)
+    return rows
+
+
+def write_snapshots(conn, directory, database_path):
+    """
+    Writes the SNAPSHOTS of the database open on `conn` to directory/<name>.arrow
+    and records them in import_snapshots. Paths are stored relative to the
+    directory of database_path, where the database will be read from.
+    """
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.dirname(os.path.abspath(database_path))
+    token = uuid.uuid4().hex
+    for name in SNAPSHOTS:
+        path = os.path.join(directory, f"{name}.arrow")
+        rows = _write_snapshot(conn, name, path, token)
+        conn.execute('''
+            INSERT OR REPLACE INTO import_snapshots (name, path, rows, token)
+            VALUES (?, ?, ?, ?)
+        ''', (name, os.path.relpath(os.path.abspath(path), base), rows, token))
+        print(f"Wrote {rows} rows to snapshot '{path}'.")
+    conn.commit()
+
+
+def load_snapshot(conn, name, columns=None):
+    """
+    Returns the snapshot `name` of the database open on `conn` as a pyarrow
+    Table backed by a memory map of the file, or None if pyarrow is missing
+    or the snapshot is missing or out of date.
+    """
+    if pa is None:
+        return None
+    try:
+        row = conn.execute('SELECT path, token FROM import_snapshots WHERE name = ?',
+                           (name,)).fetchone()
+    except sqlite3.OperationalError: # A database from before snapshots
+        return None
+    if row is None:
+        return None
+    database_path = conn.execute('PRAGMA database_list').fetchone()[2]
+    path = os.path.join(os.path.dirname(database_path), row[0])
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+    except (OSError, pa.ArrowInvalid):
+        return None
+    if (reader.schema.metadata or {}).get(b'token') != row[1].encode():
+        return None
+    table = reader.read_all()
+    return table.select(columns) if columns else table
@@ -0,0 +1,62 @@
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+import generate_sample_export
+import import_data
+
+SCRIPT = os.path.abspath(import_data.__file__)
+CHECKINS = 20000
+
+
+def import_export(cwd, *args):
+    return subprocess.Popen([sys.executable, SCRIPT, '--source', 'export',
+                             '--checkpoint', '100', *args],
+                            cwd=cwd, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.DEVNULL)
+
+
+def counts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('checkins', 'photos', 'visits', 'venues')}
+    finally:
+        conn.close()
+
+
+@pytest.fixture(scope='module')
+def export(tmp_path_factory):
+    path = tmp_path_factory.mktemp('export')
+    generate_sample_export.generate(str(path / 'export'), CHECKINS)
+    assert import_export(path).wait() == 0
+    return path
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_killed_import_leaves_a_database_that_resumes(export, tmp_path, seed):
+    os.symlink(export / 'export', tmp_path / 'export')
+    database = tmp_path / import_data.DATABASE_NAME
+    # Killed once the database has grown to a random part of its full size, so
+    # the import is somewhere in the middle of writing
+    size = random.Random(seed).uniform(0.1, 0.9) * os.path.getsize(
+        export / import_data.DATABASE_NAME)
+    process = import_export(tmp_path)
+    while process.poll() is None and not (database.exists()
+                                          and database.stat().st_size > size):
+        time.sleep(0.001)
+    process.kill()
+    assert process.wait() != 0, "the import finished before it was killed"
+
+    conn = sqlite3.connect(database)
+    try:
+        assert conn.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+    finally:
+        conn.close()
+    assert import_export(tmp_path, '--resume').wait() == 0
+    assert counts(database) == counts(export / import_data.DATABASE_NAME)
@@ -0,0 +1,93 @@
+import io
+import json
+
+import pytest
+
+import import_data
+
+DOCUMENT = {
+    'pre': 1.5,
+    'nested': {'list': [1, -2, 3.25e-3], 'flag': True, 'none': None},
+    'items': [
+        2.25,
+        3e5,
+        -17,
+        0,
+        'text with \\"quotes\\", commas, ] and } and ünïcödé',
+        {'id': 'a', 'createdAt': 1500000000,
+         'venue': {'lat': 50.4501, 'lng': -30.5234}},
+        [1.0, 2e-7, [], {}],
+        True,
+        False,
+        None,
+        123456789012345678,
+    ],
+    'post': [1, 2],
+}
+ENCODINGS = {
+    'compact': json.dumps(DOCUMENT, separators=(',', ':'), ensure_ascii=False),
+    'indented': json.dumps(DOCUMENT, indent=2, ensure_ascii=False),
+}
+
+
+@pytest.fixture(autouse=True)
+def builtin_parser(monkeypatch):
+    # These tests cover the chunked parser, which ijson replaces when installed
+    monkeypatch.setattr(import_data, 'ijson', None)
+
+
+def stream(text, **kwargs):
+    return list(import_data.iter_json_items(io.BytesIO(text.encode('utf-8')), **kwargs))
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+@pytest.mark.parametrize('chunk_size', [*range(1, 33), 64, 4096])
+def test_matches_json_load(encoding, chunk_size):
+    text = ENCODINGS[encoding]
+    assert stream(text, chunk_size=chunk_size) == json.loads(text)['items']
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 12))
+def test_number_split_after_separator(chunk_size):
+    text = '{"pre":1.5,"items":[2.25, 3e5, 1E+2, -0.5]}'
+    assert stream(text, chunk_size=chunk_size) == [2.25, 3e5, 1e2, -0.5]
+
+
+@pytest.mark.parametrize('text', ['{}', '{"items":[]}', '{"other":[1,2]}',
+                                  '{"items":{"a":1}}'])
+def test_no_items(text):
+    assert stream(text, chunk_size=3) == []
+
+
+def test_other_key():
+    assert stream('{"items":[1],"pins":[2,3]}', key='pins', chunk_size=2) == [2, 3]
+
+
+@pytest.mark.parametrize('text', ['{"items":[1 2]}', '{"items":[1,2}', '{"a" 1}'])
+def test_malformed(text):
+    with pytest.raises(ValueError):
+        stream(text, chunk_size=4)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 64])
+def test_resume_offsets(chunk_size):
+    # The offset reported after each item continues the array exactly there
+    text = ENCODINGS['indented']
+    items = json.loads(text)['items']
+    data = text.encode('utf-8')
+    tell = []
+    offsets = []
+    items_read = import_data.iter_json_items(io.BytesIO(data), chunk_size=chunk_size,
+                                             tell=tell)
+    for _ in items_read:
+        offsets.append(tell[0]())
+    assert len(offsets) == len(items)
+    assert offsets == sorted(offsets)
+    for done, offset in enumerate(offsets, 1):
+        resumed = import_data.iter_json_items(io.BytesIO(data), chunk_size=chunk_size,
+                                              resume=(done, offset))
+        assert list(resumed) == items[done:]
+
+
+def test_resume_without_offset_skips_items():
+    assert stream('{"items":[1,2,3,4]}', chunk_size=2, resume=(3, None)) == [4]
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import import_data
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    yield conn
+    conn.close()
+
+
+def setup(conn):
+    for ddl in import_data.TABLE_SCHEMAS.values():
+        conn.execute(ddl)
+    return import_data.migrate_schema(conn)
+
+
+def test_current_schema_is_left_alone(conn):
+    assert setup(conn) == []
+    assert import_data.migrate_schema(conn) == []
+
+
+def test_text_timestamps_are_rebuilt_as_integers(conn):
+    conn.execute('CREATE TABLE checkins (id TEXT PRIMARY KEY, createdAt TEXT, '
+                 'venueId TEXT, shout TEXT, timeZone TEXT)')
+    conn.execute("INSERT INTO checkins VALUES ('c1', '1500000000', 'v1', 'hi', 'UTC')")
+    assert 'checkins' in setup(conn)
+    rows = conn.execute('SELECT id, createdAt, typeof(createdAt), userId FROM checkins')
+    assert rows.fetchall() == [('c1', 1500000000, 'integer', None)]
+    assert import_data.migrate_schema(conn) == []
+
+
+def test_missing_trailing_columns_are_added(conn):
+    conn.execute('CREATE TABLE photos (id TEXT PRIMARY KEY, checkinId TEXT, '
+                 'createdAt INTEGER, fullUrl TEXT, localPath TEXT, width INTEGER, '
+                 'height INTEGER)')
+    conn.execute("INSERT INTO photos (id, width) VALUES ('p1', 640)")
+    assert setup(conn) == ['photos']
+    rows = conn.execute('SELECT id, width, userId, fileSize, fileExt FROM photos')
+    assert rows.fetchall() == [('p1', 640, None, None, None)]
+
+
+def test_changed_primary_key_is_rebuilt(conn):
+    conn.execute('CREATE TABLE venue_ratings '
+                 '(id TEXT PRIMARY KEY, name TEXT, url TEXT)')
+    conn.execute("INSERT INTO venue_ratings VALUES ('v1', 'Cafe', NULL)")
+    assert 'venue_ratings' in setup(conn)
+    columns = conn.execute('PRAGMA table_info(venue_ratings)')
+    assert [(name, pk) for _, name, _, _, _, pk in columns] == [
+        ('id', 2), ('name', 0), ('url', 0), ('userId', 1)]
+    rows = conn.execute('SELECT id, name, userId FROM venue_ratings')
+    assert rows.fetchall() == [('v1', 'Cafe', '')]
@@ -0,0 +1,50 @@
+import sqlite3
+import threading
+from collections import Counter
+
+import pytest
+
+import generate_sample_export
+import import_data
+
+
+@pytest.fixture(scope='module')
+def export(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('export'))
+    generate_sample_export.generate(path, 5000)
+    exports = import_data.open_exports([path])
+    yield exports[0]
+    exports[0].close()
+
+
+class Rows:
+    def __init__(self, counts, table):
+        self.counts, self.table = counts, table
+
+    def add(self, row):
+        self.counts[self.table] += 1
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_failed_checkpoint_fails_only_its_file(export, workers):
+    tasks = [(export, 'checkins', 'checkins.json', None),
+             (export, 'photos', 'photos.json', None)]
+    counts = Counter()
+    writers = {export: {table: Rows(counts, table)
+                        for table in ('checkins', 'photos', 'venues')}}
+
+    def checkpoint(task, progress):
+        if task[1] == 'checkins':
+            raise sqlite3.OperationalError('database is locked')
+
+    result = []
+    # Small checkpoints overfill the queue, so workers are blocked on it while
+    # the error is handled. Joined with a timeout so a hang is reported.
+    thread = threading.Thread(target=lambda: result.append(import_data.parse_files(
+        tasks, writers, workers=workers, checkpoint=checkpoint, checkpoint_every=50)),
+        daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert result == [[tasks[0]]]
+    assert counts['checkins'] == 50
+    assert counts['photos'] == 1500
@@ -0,0 +1,85 @@
+import sqlite3
+
+import pytest
+
+import import_data
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    for ddl in import_data.TABLE_SCHEMAS.values():
+        conn.execute(ddl)
+    yield conn
+    conn.close()
+
+
+def import_venues(conn, *rows):
+    venues = import_data.VenueAccumulator()
+    for row in rows:
+        venues.add(row)
+    import_data.write_venues(conn, venues)
+    return venues
+
+
+def stored(conn, venue_id='v1'):
+    return conn.execute('SELECT name, address, lat, lng, url FROM venues WHERE id = ?',
+                        (venue_id,)).fetchone()
+
+
+def test_higher_priority_source_wins_within_a_run(conn):
+    import_venues(conn,
+                  ('tips', 'v1', 'Tip name', None, None, None, None),
+                  ('checkins', 'v1', 'Cafe', 'Main St 1', 50.4, 30.5, None),
+                  ('unconfirmed_visits', 'v1', 'Visit name', None, 0.5, 0.5,
+                   'http://cafe'))
+    assert stored(conn) == ('Cafe', 'Main St 1', 50.4, 30.5, 'http://cafe')
+
+
+def test_lower_priority_source_in_a_later_run_only_fills_gaps(conn):
+    import_venues(conn, ('checkins', 'v1', 'Cafe', None, 50.4, 30.5, None))
+    venues = import_venues(conn,
+                           ('tips', 'v1', 'Tip name', None, None, None, None),
+                           ('unconfirmed_visits', 'v1', 'Visit name', None, 0.5, 0.5,
+                            'http://cafe'))
+    assert stored(conn) == ('Cafe', None, 50.4, 30.5, 'http://cafe')
+    assert venues.unchanged == 0
+
+    venues = import_venues(conn, ('tips', 'v1', 'Tip name', None, None, None, None))
+    assert stored(conn) == ('Cafe', None, 50.4, 30.5, 'http://cafe')
+    assert venues.unchanged == 1
+
+
+def test_same_priority_source_in_a_later_run_replaces(conn):
+    import_venues(conn, ('checkins', 'v1', 'Cafe', None, 50.4, 30.5, None))
+    import_venues(conn, ('checkins', 'v1', 'Renamed', None, 50.4, 30.5, None))
+    assert stored(conn) == ('Renamed', None, 50.4, 30.5, None)
+
+
+def test_venues_without_recorded_sources_rank_as_checkins(conn):
+    conn.execute("INSERT INTO venues (id, name, lat, lng) "
+                 "VALUES ('v1', 'Cafe', 50.4, 30.5)")
+    import_venues(conn, ('unconfirmed_visits', 'v1', 'Visit name', None, 0.5, 0.5,
+                         'http://cafe'))
+    assert stored(conn) == ('Cafe', None, 50.4, 30.5, 'http://cafe')
+
+
+def test_later_export_wins_at_the_same_priority(conn):
+    for order in ([0, 1], [1, 0]):
+        conn.execute('DELETE FROM venues')
+        conn.execute('DELETE FROM venue_sources')
+        venues = import_data.VenueAccumulator()
+        names = {0: 'Station 0', 1: 'Renamed'}
+        for rank in order:
+            venues.add(('checkins', 'v1', names[rank], None, 50.4, 30.5, None), rank)
+        venues.add(('tips', 'v1', 'Tip name', None, None, None, None), 2)
+        import_data.write_venues(conn, venues)
+        assert stored(conn) == ('Renamed', None, 50.4, 30.5, None)
+
+
+def test_venues_written_at_checkpoints_are_reported(conn, capsys):
+    venues = import_venues(conn, ('checkins', 'v1', 'Cafe', None, 50.4, 30.5, None))
+    venues.add(('checkins', 'v2', 'Bar', None, 50.5, 30.6, None))
+    import_data.import_venues_data(conn, venues)
+    assert venues.written == {'v1', 'v2'}
+    assert 'inserted/updated: 2' in capsys.readouterr().out
@@ -38,6 +38,16 @@ def verify_data():
     else:
         print("All photos seem to be linked to a checkin.")
 
+    print("\n--- Photo files (indexed from pix/ by import_data.py) ---")
+    cursor.execute("SELECT count(localPath), coalesce(sum(fileSize), 0) FROM photos")
+    photos_with_file, photo_bytes = cursor.fetchone()
+    print(f"Photos with a local file: {photos_with_file} of {photos_count} "
+          f"({photo_bytes / (1024 * 1024):.1f} MiB)")
+    cursor.execute("SELECT fileExt, count(*) FROM photos WHERE fileExt IS NOT NULL "
+                   "GROUP BY fileExt ORDER BY count(*) DESC")
+    for ext, count in cursor.fetchall():
+        print(f"  .{ext}: {count}")
+
     print("\n--- Verifying Users Table ---")
     cursor.execute("SELECT COUNT(*) FROM users")
     users_count = cursor.fetchone()[0]
@@ -9,6 +9,8 @@ import os
 from datetime import datetime
 import math
 
+import snapshots
+
 # --- Configuration ---
 DB_NAME = 'foursquare_data.db'
 OUTPUT_DIR = 'visualizations'
@@ -23,31 +25,39 @@ def load_data():
 
     conn = sqlite3.connect(DB_NAME)
     
-    # Checkins with Venue Data
-    print("Loading Checkins and Venues...")
-    query_checkins = """
-    SELECT 
-        c.id, c.createdAt, c.shout, c.timeZone,
-        v.name as venue_name, v.lat, v.lng, v.address, v.id as venue_id
-    FROM checkins c
-    LEFT JOIN venues v ON c.venueId = v.id
-    """
-    df_checkins = pd.read_sql_query(query_checkins, conn)
+    # Checkins with Venue Data, from the Arrow snapshot written by
+    # import_data.py when it is current (memory-mapped, no row decoding)
+    snapshot = snapshots.load_snapshot(conn, 'checkins')
+    if snapshot is not None:
+        print("Loading Checkins and Venues from the Arrow snapshot...")
+        df_checkins = snapshot.to_pandas()
+    else:
+        print("Loading Checkins and Venues...")
+        query_checkins = """
+        SELECT 
+            c.id, c.createdAt, c.shout, c.timeZone, c.userId,
+            v.name as venue_name, v.lat, v.lng, v.address, v.id as venue_id
+        FROM checkins c
+        LEFT JOIN venues v ON c.venueId = v.id
+        ORDER BY c.createdAt, c.id
+        """
+        df_checkins = pd.read_sql_query(query_checkins, conn)
     
-    # Convert createdAt to datetime (assuming it's a unix timestamp in seconds)
-    # If it's stored as a string literal of a number, pandas handles it gracefully usually, 
-    # but let's be safe.
-    df_checkins['createdAt'] = pd.to_numeric(df_checkins['createdAt'])
+    # createdAt is stored as INTEGER unix seconds
     df_checkins['datetime'] = pd.to_datetime(df_checkins['createdAt'], unit='s')
     
     # Visits Data
-    print("Loading Visits...")
-    query_visits = """SELECT * FROM visits
-    """
-    df_visits = pd.read_sql_query(query_visits, conn)
-    # Visits often have timeArrived as unix timestamp
+    snapshot = snapshots.load_snapshot(conn, 'visits')
+    if snapshot is not None:
+        print("Loading Visits from the Arrow snapshot...")
+        df_visits = snapshot.to_pandas()
+    else:
+        print("Loading Visits...")
+        query_visits = """SELECT * FROM visits ORDER BY timeArrived, id
+        """
+        df_visits = pd.read_sql_query(query_visits, conn)
+    # timeArrived is stored as INTEGER unix seconds
     if not df_visits.empty:
-        df_visits['timeArrived'] = pd.to_numeric(df_visits['timeArrived'])
         df_visits['datetime'] = pd.to_datetime(df_visits['timeArrived'], unit='s')
 
     conn.close()